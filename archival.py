@@ -0,0 +1,231 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from cache_bus import cache_bus
+
+LISTING_TTL_DAYS = int(os.getenv("LISTING_TTL_DAYS", 30))
+# Taken books stay visible this long so both sides can still open the listing
+TAKEN_RETENTION_DAYS = int(os.getenv("TAKEN_RETENTION_DAYS", 14))
+# Read notifications are deleted by a TTL index this long after being read
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 30))
+# Finished exchanges stay in the hot collection this long after their last transition
+EXCHANGE_RETENTION_DAYS = int(os.getenv("EXCHANGE_RETENTION_DAYS", 90))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+ARCHIVE_SWEEP_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_SWEEP_INTERVAL_SECONDS", 15 * 60))
+# Disable on all but one worker if the duplicate (harmless) sweeps are unwanted
+ARCHIVE_SWEEPER_ENABLED = os.getenv("ARCHIVE_SWEEPER_ENABLED", "1") == "1"
+
+BOOKS_ARCHIVE = "books_archive"
+EXCHANGES_ARCHIVE = "exchanges_archive"
+NOTIFICATION_TTL_INDEX = "read_at_ttl"
+FINISHED_EXCHANGE_STATUSES = ["completed", "declined", "cancelled"]
+
+
+def listing_expiry(start: Optional[datetime] = None) -> datetime:
+    return (start or datetime.utcnow()) + timedelta(days=LISTING_TTL_DAYS)
+
+
+def expired_books_filter(now: datetime) -> Dict[str, Any]:
+    return {"$or": [
+        # Taken listings follow TAKEN_RETENTION_DAYS even when their listing period is over
+        {"expires_at": {"$lt": now}, "is_taken": {"$ne": True}},
+        # Listings created before expires_at was stored
+        {"expires_at": {"$exists": False}, "created_at": {"$lt": now - timedelta(days=LISTING_TTL_DAYS)}, "is_taken": {"$ne": True}},
+        {"is_taken": True, "taken_at": {"$lt": now - timedelta(days=TAKEN_RETENTION_DAYS)}},
+    ]}
+
+
+def finished_exchanges_filter(now: datetime) -> Dict[str, Any]:
+    cutoff = now - timedelta(days=EXCHANGE_RETENTION_DAYS)
+    return {
+        "status": {"$in": FINISHED_EXCHANGE_STATUSES},
+        "$or": [
+            {"updated_at": {"$lt": cutoff}},
+            # Exchanges finished before updated_at was stored
+            {"updated_at": {"$exists": False}, "created_at": {"$lt": cutoff}},
+        ]
+    }
+
+
+async def find_with_archive(
+    db, collection: str, archive: str, query: Dict[str, Any], skip: int, limit: int, include_archived: bool
+) -> List[Dict[str, Any]]:
+    """Newest-first page over a collection, optionally merged with its archive"""
+    if not include_archived:
+        return await db[collection].find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    hot = await db[collection].find(query).sort("created_at", -1).limit(skip + limit).to_list(skip + limit)
+    cold = await db[archive].find(query).sort("created_at", -1).limit(skip + limit).to_list(skip + limit)
+    merged = sorted(hot + cold, key=lambda document: document.get("created_at") or datetime.min, reverse=True)
+    return merged[skip:skip + limit]
+
+
+class Archiver:
+    """Background sweeper moving finished documents out of the hot collections in batches.
+
+    A batch is copied to the archive, then each document is deleted from the
+    hot collection only if it still matches the filter and is unchanged
+    since it was copied. Anything that was modified in between (e.g. a
+    listing accepted or renewed) stays, and its stale archive copy is
+    removed again. Re-running a batch after a crash is safe, so every worker
+    may sweep.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, db):
+        """Create indexes and start sweeping; call from app startup"""
+        self._db = db
+        await self.ensure_indexes()
+        if ARCHIVE_SWEEPER_ENABLED:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def ensure_indexes(self):
+        await self._db.books.create_index("expires_at")
+        await self._db.books.create_index([("is_taken", 1), ("taken_at", 1)])
+        await self._db[BOOKS_ARCHIVE].create_index("user_id")
+        await self._db.notifications.create_index([("user_id", 1), ("created_at", -1)])
+        await self._ensure_notification_ttl()
+        for index in ([("requester_id", 1), ("created_at", -1)], [("owner_id", 1), ("created_at", -1)]):
+            await self._db.exchanges.create_index(index)
+            await self._db[EXCHANGES_ARCHIVE].create_index(index)
+
+    async def _ensure_notification_ttl(self):
+        expire_after = NOTIFICATION_RETENTION_DAYS * 24 * 60 * 60
+        try:
+            await self._db.notifications.create_index(
+                "read_at",
+                name=NOTIFICATION_TTL_INDEX,
+                expireAfterSeconds=expire_after,
+                partialFilterExpression={"read": True}
+            )
+        except OperationFailure as e:
+            # IndexOptionsConflict: the retention period changed since the index was built
+            if e.code != 85:
+                raise
+            await self._db.command(
+                "collMod", "notifications",
+                index={"name": NOTIFICATION_TTL_INDEX, "expireAfterSeconds": expire_after}
+            )
+
+    async def _run(self):
+        # Spread workers out so they do not all sweep at the same moment
+        await asyncio.sleep(random.uniform(0, min(60, ARCHIVE_SWEEP_INTERVAL_SECONDS)))
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Archive sweep error: {str(e)}")
+            await asyncio.sleep(ARCHIVE_SWEEP_INTERVAL_SECONDS)
+
+    async def sweep(self) -> Dict[str, int]:
+        return {
+            "books": await self.sweep_books(),
+            "taken_books": await self.stamp_taken_books(),
+            "exchanges": await self.sweep_exchanges(),
+            "notifications": await self.stamp_read_notifications()
+        }
+
+    async def sweep_books(self) -> int:
+        total = 0
+        while True:
+            moved = await self._archive_batch("books", BOOKS_ARCHIVE, expired_books_filter(datetime.utcnow()))
+            if moved:
+                await cache_bus.publish("books", *moved)
+            total += len(moved)
+            if len(moved) < ARCHIVE_BATCH_SIZE:
+                return total
+
+    async def sweep_exchanges(self) -> int:
+        total = 0
+        while True:
+            moved = await self._archive_batch("exchanges", EXCHANGES_ARCHIVE, finished_exchanges_filter(datetime.utcnow()))
+            if moved:
+                await cache_bus.publish("exchanges", *moved)
+            total += len(moved)
+            if len(moved) < ARCHIVE_BATCH_SIZE:
+                return total
+
+    async def stamp_taken_books(self) -> int:
+        """Give books taken before taken_at was recorded a start for TAKEN_RETENTION_DAYS"""
+        result = await self._db.books.update_many(
+            {"is_taken": True, "taken_at": {"$exists": False}},
+            {"$set": {"taken_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    async def stamp_read_notifications(self) -> int:
+        """Give notifications read before read_at was recorded a start for their TTL"""
+        result = await self._db.notifications.update_many(
+            {"read": True, "read_at": {"$exists": False}},
+            {"$set": {"read_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    async def _archive_batch(self, source: str, target: str, query: Dict[str, Any]) -> List[Any]:
+        """Move up to ARCHIVE_BATCH_SIZE documents matching `query`; returns the ids moved"""
+        documents = await self._db[source].find(query).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+        if not documents:
+            return []
+        ids = [document["_id"] for document in documents]
+        archived_at = datetime.utcnow()
+        for document in documents:
+            document["archived_at"] = archived_at
+        # Replace rather than insert so a copy left by an interrupted earlier batch is brought up to date
+        await self._db[target].bulk_write(
+            [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents], ordered=False
+        )
+
+        # Matching every copied field means the delete only removes exactly what was archived
+        result = await self._db[source].bulk_write([
+            DeleteOne({"$and": [query, {k: v for k, v in document.items() if k != "archived_at"}]})
+            for document in documents
+        ], ordered=False)
+        if result.deleted_count == len(ids):
+            return ids
+        remaining = {
+            document["_id"]
+            async for document in self._db[source].find({"_id": {"$in": ids}}, {"_id": 1})
+        }
+        await self._db[target].delete_many({"_id": {"$in": list(remaining)}})
+        return [_id for _id in ids if _id not in remaining]
+
+    async def renew_book(self, book_id) -> Optional[Dict[str, Any]]:
+        """Extend an available listing, restoring it from the archive if it already expired"""
+        expires_at = listing_expiry()
+        book = await self._db.books.find_one_and_update(
+            {"_id": book_id, "is_taken": {"$ne": True}},
+            {"$set": {"expires_at": expires_at}},
+            return_document=ReturnDocument.AFTER
+        )
+        if book is not None:
+            return book
+
+        archived = await self._db[BOOKS_ARCHIVE].find_one({"_id": book_id, "is_taken": {"$ne": True}})
+        if archived is None:
+            return None
+        archived.pop("archived_at", None)
+        archived["expires_at"] = expires_at
+        try:
+            await self._db.books.insert_one(archived)
+        except DuplicateKeyError:
+            # Still live, so the archived copy is stale and the listing was taken meanwhile
+            return None
+        await self._db[BOOKS_ARCHIVE].delete_one({"_id": book_id})
+        return archived
+
+
+# Global archiver instance
+archiver = Archiver()
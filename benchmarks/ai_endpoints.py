@@ -0,0 +1,142 @@
+"""Drive the AI endpoints concurrently against the offline fake model.
+
+Seeds a throwaway database on a local mongod, runs the recommendation, chat
+and insights endpoints in-process with the fake Gemini backend, and reports
+throughput, p50/p99 latency and fallback rates per endpoint.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/ai_endpoints.py \\
+        --concurrency 32 --duration 30 --latency-ms 800 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+
+from common import latency_summary, run_app_lifespan
+
+ENDPOINTS = {
+    "recommendations": ("POST", "/ai/generate-recommendations/{user_id}"),
+    "chat": ("POST", "/ai/chat/{user_id}"),
+    "insights": ("GET", "/users/{user_id}/ai-insights"),
+}
+
+GENRES = ["Fantasy", "Science Fiction", "Mystery", "Thriller", "Classic", "Romance"]
+
+
+def configure_environment(args):
+    os.environ["AI_BACKEND"] = "fake"
+    os.environ["FAKE_AI_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_AI_LATENCY_DISTRIBUTION"] = args.distribution
+    os.environ["FAKE_AI_ERROR_RATE"] = str(args.error_rate)
+    os.environ["FAKE_AI_MALFORMED_RATE"] = str(args.malformed_rate)
+    os.environ["FAKE_AI_SEED"] = str(args.seed)
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    if not args.with_cache:
+        # Every insights request should reach the model
+        os.environ["INSIGHTS_CACHE_TTL_SECONDS"] = "0"
+        os.environ["INSIGHTS_CACHE_STALE_SECONDS"] = "0"
+
+
+async def seed(db, users: int, books: int):
+    rng = random.Random(0)
+    user_ids = [f"bench-user-{i}" for i in range(users)]
+    await db.books.insert_many([
+        {
+            "user_id": rng.choice(user_ids),
+            "bookName": f"Benchmark Book {i}",
+            "authorName": f"Author {i % 40}",
+            "genre": rng.choice(GENRES),
+            "description": "A book used to exercise the AI endpoints.",
+            "bookCondition": "Good",
+            "bookImages": [],
+            "is_taken": False,
+        }
+        for i in range(books)
+    ])
+    await db.preferences.insert_many([
+        {"user_id": user_id, "favorite_genres": rng.sample(GENRES, 2), "favorite_authors": [], "reading_preferences": {}}
+        for user_id in user_ids
+    ])
+    await db.reading_stats.insert_many([
+        {"user_id": user_id, "books_read": rng.randint(0, 50), "top_genres": rng.sample(GENRES, 2)}
+        for user_id in user_ids
+    ])
+    return user_ids
+
+
+async def worker(client, user_ids, weights, deadline, latencies, failures, rng):
+    names = list(weights)
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights=[weights[n] for n in names])[0]
+        method, path = ENDPOINTS[name]
+        url = path.format(user_id=rng.choice(user_ids))
+        start = time.perf_counter()
+        response = await client.request(method, url, json={"message": "Recommend me something"} if name == "chat" else None)
+        latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            failures[name] += 1
+
+
+async def main(args):
+    configure_environment(args)
+
+    import httpx
+    import main as app_module
+    from dataBase import db, get_client
+
+    mongo_client = get_client()
+
+    await mongo_client.drop_database(args.db_name)
+    user_ids = await seed(db, args.users, args.books)
+    await run_app_lifespan(app_module.app, "startup")
+
+    weights = {"recommendations": args.recommendations_weight, "chat": args.chat_weight, "insights": args.insights_weight}
+    latencies = defaultdict(list)
+    failures = defaultdict(int)
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*[
+            worker(client, user_ids, weights, deadline, latencies, failures, random.Random(args.seed + i))
+            for i in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    await mongo_client.drop_database(args.db_name)
+    await run_app_lifespan(app_module.app, "shutdown")
+
+    outcomes = app_module.ai_service.outcomes
+    print(f"{args.concurrency} clients, {elapsed:.1f}s, fake latency {args.distribution} {args.latency_ms}ms")
+    print(f"{'endpoint':<16}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'http err':>9}{'fallback':>10}{'malformed':>10}")
+    for name in weights:
+        summary = latency_summary(latencies[name], elapsed)
+        calls = sum(outcomes[(name, o)] for o in ("ok", "malformed", "error", "unavailable"))
+        fallbacks = outcomes[(name, "error")] + outcomes[(name, "unavailable")]
+        malformed = outcomes[(name, "malformed")]
+        print(
+            f"{name:<16}{summary['requests']:>9}{summary['throughput']:>9.1f}"
+            f"{summary['p50_ms']:>10.1f}{summary['p99_ms']:>10.1f}{failures[name]:>9}"
+            f"{(fallbacks / calls if calls else 0):>10.1%}{(malformed / calls if calls else 0):>10.1%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--distribution", default="lognormal", choices=["constant", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--recommendations-weight", type=float, default=1.0)
+    parser.add_argument("--chat-weight", type=float, default=1.0)
+    parser.add_argument("--insights-weight", type=float, default=1.0)
+    parser.add_argument("--with-cache", action="store_true", help="Leave the insights cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-name", default="bookwise_ai_bench")
+    asyncio.run(main(parser.parse_args()))
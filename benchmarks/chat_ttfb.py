@@ -0,0 +1,108 @@
+"""Compare time to first byte of /ai/chat/{user_id} against its streaming variant.
+
+Run against a live server:
+
+    uvicorn main:app --port 8000
+    python benchmarks/chat_ttfb.py --base-url http://localhost:8000 --user-id <id> --runs 10
+
+or let the script serve the app itself with uvicorn, on mongomock-motor with
+seeded books and the offline fake model (AI_BACKEND=fake unless set):
+
+    FAKE_AI_LATENCY_MS=800 python benchmarks/chat_ttfb.py --in-memory --runs 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import aiohttp
+
+from common import use_in_memory_database
+from seed import seed_database
+
+
+async def measure_blocking(session, url, payload):
+    start = time.perf_counter()
+    async with session.post(url, json=payload) as resp:
+        await resp.content.read(1)
+        ttfb = time.perf_counter() - start
+        await resp.read()
+    total = time.perf_counter() - start
+    return ttfb, ttfb, total
+
+
+async def measure_stream(session, url, payload):
+    start = time.perf_counter()
+    ttfb = first_chunk = None
+    async with session.post(url, json=payload) as resp:
+        async for line in resp.content:
+            now = time.perf_counter() - start
+            if ttfb is None:
+                ttfb = now
+            if first_chunk is None and line.startswith(b"data: ") and b'"chunk"' in line:
+                first_chunk = now
+    total = time.perf_counter() - start
+    return ttfb, first_chunk if first_chunk is not None else total, total
+
+
+def summarize(name, samples):
+    ttfb, first_text, total = zip(*samples)
+    print(
+        f"{name:<10} ttfb p50={statistics.median(ttfb) * 1000:8.1f}ms  "
+        f"first text p50={statistics.median(first_text) * 1000:8.1f}ms  "
+        f"total p50={statistics.median(total) * 1000:8.1f}ms"
+    )
+
+
+async def serve_in_memory(args):
+    """Start uvicorn on a free port in this process; returns (server, task, base url, user id)"""
+    # Read when the app modules are imported; the rate limits would reject most of the runs
+    os.environ.setdefault("AI_BACKEND", "fake")
+    os.environ.setdefault("AI_CHAT_PER_MINUTE", "1000000")
+    os.environ.setdefault("AI_CHAT_BURST", "1000000")
+    use_in_memory_database()
+
+    import uvicorn
+    import main as app_module
+    from dataBase import db
+    from startup import free_port
+
+    ids = await seed_database(db, users=20, books=500, exchanges=0, interactions=0)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task, f"http://127.0.0.1:{port}", ids["user_ids"][0]
+
+
+async def main(args):
+    server = None
+    if args.in_memory:
+        server, task, args.base_url, args.user_id = await serve_in_memory(args)
+    elif not args.user_id:
+        raise SystemExit("--user-id is required without --in-memory")
+    payload = {"message": args.message}
+    base = args.base_url.rstrip("/")
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        blocking, streaming = [], []
+        for _ in range(args.runs):
+            blocking.append(await measure_blocking(session, f"{base}/ai/chat/{args.user_id}", payload))
+            streaming.append(await measure_stream(session, f"{base}/ai/chat/{args.user_id}/stream", payload))
+    summarize("blocking", blocking)
+    summarize("streaming", streaming)
+    if server is not None:
+        server.should_exit = True
+        await task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--user-id")
+    parser.add_argument("--in-memory", action="store_true", help="Serve the app here on mongomock-motor and the fake model")
+    parser.add_argument("--message", default="Can you recommend something like my books?")
+    parser.add_argument("--runs", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
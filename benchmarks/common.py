@@ -0,0 +1,45 @@
+"""Helpers shared by the benchmark scripts."""
+import math
+import os
+import sys
+from typing import Dict, List, Sequence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of unsorted samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run_app_lifespan(app, event: str):
+    """Run the app's startup/shutdown handlers when driving it through an ASGI transport"""
+    handler = getattr(app.router, event, None)
+    if handler is not None:
+        await handler()
+
+
+def use_in_memory_database():
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--in-memory needs the mongomock-motor package")
+
+    import dataBase
+    dataBase.use_client(AsyncMongoMockClient())
@@ -0,0 +1,221 @@
+"""End-to-end load test of the BookWise API.
+
+Seeds a throwaway database (a local mongod, or an in-memory Motor stand-in
+with --in-memory), runs weighted user scenarios against the FastAPI app
+in-process and reports throughput and latency percentiles per route.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/loadtest.py --duration 60 \\
+        --save-baseline benchmarks/baseline.json
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/loadtest.py --duration 60 \\
+        --baseline benchmarks/baseline.json --tolerance 0.25
+
+With --baseline the script exits with status 1 when any route's p99 latency
+grew, or its throughput dropped, by more than the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from common import latency_summary, percentile, run_app_lifespan, use_in_memory_database
+from seed import seed_database
+
+DEFAULT_WEIGHTS = {
+    "browse": 35,
+    "book_detail": 25,
+    "exchange": 10,
+    "notifications": 20,
+    "interactions": 10,
+}
+
+
+class Recorder:
+    def __init__(self, client):
+        self.client = client
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, route: str, method: str, url: str, **kwargs):
+        """Issue a request and file its latency under the route template"""
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+
+async def browse(rec: Recorder, ids, rng: random.Random):
+    await rec.request("GET /books/", "GET", "/books/", params={"skip": rng.randint(0, 200), "limit": 20})
+    if rng.random() < 0.3:
+        await rec.request("GET /books/genres", "GET", "/books/genres")
+    if rng.random() < 0.05:
+        await rec.request("GET /getBooks", "GET", "/getBooks")
+
+
+async def book_detail(rec: Recorder, ids, rng: random.Random):
+    await rec.request("GET /books/{book_id}", "GET", f"/books/{rng.choice(ids['book_ids'])}")
+
+
+async def exchange(rec: Recorder, ids, rng: random.Random):
+    book_id = rng.choice(ids["book_ids"])
+    response = await rec.request("POST /exchanges/request", "POST", "/exchanges/request", json={
+        "requester_id": rng.choice(ids["user_ids"]),
+        "book_id": book_id,
+        "owner_id": ids["book_owners"][book_id],
+        "message": "Load test exchange",
+    })
+    if response.status_code != 200:
+        return
+    exchange_id = response.json()["exchange"]["id"]
+    await rec.request("PUT /exchanges/{exchange_id}/respond", "PUT", f"/exchanges/{exchange_id}/respond", json={
+        "exchange_id": exchange_id,
+        # Mostly decline so the pool of available books does not drain during the run
+        "response_type": "accepted" if rng.random() < 0.1 else "declined",
+        "message": "Load test response",
+    })
+
+
+async def notifications(rec: Recorder, ids, rng: random.Random):
+    user_id = rng.choice(ids["user_ids"])
+    await rec.request(
+        "GET /notifications/users/{user_id}", "GET", f"/notifications/users/{user_id}",
+        params={"unread_only": rng.random() < 0.5}
+    )
+    if rng.random() < 0.2:
+        await rec.request("GET /exchanges/user/{user_id}", "GET", f"/exchanges/user/{user_id}")
+
+
+async def interactions(rec: Recorder, ids, rng: random.Random):
+    book_id = rng.choice(ids["book_ids"])
+    await rec.request("POST /books/{book_id}/interaction", "POST", f"/books/{book_id}/interaction", json={
+        "user_id": rng.choice(ids["user_ids"]),
+        "book_id": book_id,
+        "interaction_type": rng.choice(["view", "view", "favorite", "share"]),
+    })
+
+
+SCENARIOS = {
+    "browse": browse,
+    "book_detail": book_detail,
+    "exchange": exchange,
+    "notifications": notifications,
+    "interactions": interactions,
+}
+
+
+def parse_weights(spec: str):
+    weights = dict(DEFAULT_WEIGHTS)
+    if spec:
+        for part in spec.split(","):
+            name, _, value = part.partition("=")
+            if name not in SCENARIOS:
+                raise SystemExit(f"Unknown scenario: {name}")
+            weights[name] = float(value)
+    return weights
+
+
+async def virtual_user(rec: Recorder, ids, weights, deadline, rng: random.Random):
+    names = list(weights)
+    scenario_weights = [weights[name] for name in names]
+    while time.perf_counter() < deadline:
+        scenario = SCENARIOS[rng.choices(names, weights=scenario_weights)[0]]
+        await scenario(rec, ids, rng)
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    regressions = []
+    for route, base in baseline.items():
+        current = results.get(route)
+        if not current:
+            continue
+        if current["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p99 {current['p99_ms']:.1f}ms vs baseline {base['p99_ms']:.1f}ms")
+        if current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{route}: {current['throughput']:.1f} req/s vs baseline {base['throughput']:.1f} req/s")
+    return regressions
+
+
+async def main(args):
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    if args.in_memory:
+        use_in_memory_database()
+
+    import httpx
+    import main as app_module
+    from dataBase import db, get_client
+
+    mongo_client = get_client()
+
+    await mongo_client.drop_database(args.db_name)
+    ids = await seed_database(db, args.users, args.books, args.exchanges, args.interactions, args.seed)
+    await run_app_lifespan(app_module.app, "startup")
+
+    weights = parse_weights(args.weights)
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        rec = Recorder(client)
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*[
+            virtual_user(rec, ids, weights, deadline, random.Random(args.seed + i))
+            for i in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    if not args.keep_data:
+        await mongo_client.drop_database(args.db_name)
+    await run_app_lifespan(app_module.app, "shutdown")
+
+    results = {}
+    print(f"{args.concurrency} virtual users, {elapsed:.1f}s")
+    print(f"{'route':<40}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for route in sorted(rec.latencies):
+        samples = rec.latencies[route]
+        summary = latency_summary(samples, elapsed)
+        summary["p95_ms"] = percentile(samples, 95) * 1000
+        summary["errors"] = rec.errors[route]
+        results[route] = summary
+        print(
+            f"{route:<40}{summary['requests']:>9}{summary['throughput']:>9.1f}{summary['p50_ms']:>10.1f}"
+            f"{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}{summary['errors']:>8}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--exchanges", type=int, default=1000)
+    parser.add_argument("--interactions", type=int, default=20000)
+    parser.add_argument("--weights", default="", help="e.g. browse=50,exchange=5")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-name", default="bookwise_load")
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock-motor instead of a mongod")
+    parser.add_argument("--keep-data", action="store_true")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,141 @@
+"""Seed a MongoDB database with synthetic users, books, exchanges and interactions.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/seed.py --db-name bookwise_load \\
+        --users 1000 --books 5000 --exchanges 2000 --interactions 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo root on sys.path)
+
+GENRES = [
+    "Fantasy", "Science Fiction", "Mystery", "Thriller", "Classic",
+    "Romance", "Biography", "History", "Philosophy", "Adventure"
+]
+CONDITIONS = ["New", "Like New", "Good", "Fair"]
+INTERACTION_TYPES = ["view", "view", "view", "favorite", "share", "exchange_request"]
+BATCH_SIZE = 1000
+
+
+async def _insert_batched(collection, docs: List[Dict[str, Any]]):
+    for start in range(0, len(docs), BATCH_SIZE):
+        await collection.insert_many(docs[start:start + BATCH_SIZE], ordered=False)
+
+
+async def seed_database(db, users: int, books: int, exchanges: int, interactions: int, seed: int = 0) -> Dict[str, Any]:
+    """Insert synthetic data and return the ids the load scenarios pick from"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    user_docs = [
+        {
+            "email": f"load-user-{i}@example.com",
+            "fName": f"Load{i}",
+            "lName": "User",
+            "password": "not-a-real-hash",
+            "created_at": now - timedelta(days=rng.randint(0, 365)),
+        }
+        for i in range(users)
+    ]
+    await _insert_batched(db.users, user_docs)
+    user_ids = [str(doc["_id"]) for doc in user_docs]
+
+    book_docs = [
+        {
+            "user_id": rng.choice(user_ids),
+            "bookName": f"Load Test Book {i}",
+            "authorName": f"Author {rng.randint(0, max(1, books // 10))}",
+            "genre": rng.choice(GENRES),
+            "description": f"A {rng.choice(GENRES).lower()} story used for load testing.",
+            "bookCondition": rng.choice(CONDITIONS),
+            "bookImages": [],
+            "is_taken": rng.random() < 0.1,
+            "created_at": now - timedelta(days=rng.randint(0, 60)),
+        }
+        for i in range(books)
+    ]
+    await _insert_batched(db.books, book_docs)
+    books_by_id = {str(doc["_id"]): doc for doc in book_docs}
+    book_ids = list(books_by_id)
+
+    exchange_docs = []
+    for _ in range(exchanges):
+        book_id = rng.choice(book_ids)
+        owner_id = books_by_id[book_id]["user_id"]
+        exchange_docs.append({
+            "requester_id": rng.choice(user_ids),
+            "book_id": book_id,
+            "owner_id": owner_id,
+            "message": "Load test exchange",
+            "status": rng.choice(["pending", "accepted", "declined", "completed"]),
+            "created_at": now - timedelta(days=rng.randint(0, 90)),
+        })
+    await _insert_batched(db.exchanges, exchange_docs)
+
+    await _insert_batched(db.notifications, [
+        {
+            "user_id": doc["owner_id"],
+            "type": "exchange_request",
+            "title": "New Exchange Request",
+            "message": "Someone wants to exchange your book",
+            "data": {"exchange_id": str(doc["_id"])},
+            "read": rng.random() < 0.5,
+            "created_at": doc["created_at"],
+        }
+        for doc in exchange_docs
+    ])
+
+    interaction_docs = [
+        {
+            "user_id": rng.choice(user_ids),
+            "book_id": rng.choice(book_ids),
+            "interaction_type": rng.choice(INTERACTION_TYPES),
+            "timestamp": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+            "metadata": None,
+        }
+        for _ in range(interactions)
+    ]
+    await _insert_batched(db.book_interactions, interaction_docs)
+
+    await _insert_batched(db.preferences, [
+        {
+            "user_id": user_id,
+            "favorite_genres": rng.sample(GENRES, 2),
+            "favorite_authors": [],
+            "reading_preferences": {},
+            "updated_at": now,
+        }
+        for user_id in user_ids
+    ])
+
+    return {
+        "user_ids": user_ids,
+        "book_ids": book_ids,
+        "book_owners": {book_id: doc["user_id"] for book_id, doc in books_by_id.items()},
+    }
+
+
+async def main(args):
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    from dataBase import db, get_client
+
+    if args.drop:
+        await get_client().drop_database(args.db_name)
+    ids = await seed_database(db, args.users, args.books, args.exchanges, args.interactions, args.seed)
+    print(f"Seeded {len(ids['user_ids'])} users and {len(ids['book_ids'])} books into {args.db_name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-name", default="bookwise_load")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--books", type=int, default=5000)
+    parser.add_argument("--exchanges", type=int, default=2000)
+    parser.add_argument("--interactions", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--drop", action="store_true", help="Drop the database before seeding")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+"""Compare response_model validation with the trusted serializer on synthetic Mongo rows.
+
+Runs without a database: builds rows shaped like the stored notifications,
+recommendations and exchanges, serializes them the way FastAPI does for a
+route with response_model=List[...] and with serialization.trusted_response,
+checks both produce the same JSON and reports rows per second.
+
+    python benchmarks/serialization.py --rows 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+try:
+    from fastapi.utils import create_response_field
+except ImportError:  # Renamed in newer FastAPI releases
+    from fastapi.utils import create_model_field as create_response_field
+
+import common  # noqa: F401  (puts the repo root on sys.path)
+from models.exchange_models import ExchangeDetails
+from models.notification_models import Notification
+from models.preference_models import AIRecommendation
+from serialization import TrustedSerializer
+
+
+def notification_rows(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "user_id": str(ObjectId()),
+        "type": random.choice(["exchange_request", "book_available", "exchange_completed"]),
+        "title": "New Book Available",
+        "message": f"'Book {i}' by Author {i % 50} was just listed",
+        "data": {"book_id": str(ObjectId()), "book_name": f"Book {i}", "genre": "Fantasy"},
+        "read": i % 3 == 0,
+        "created_at": now - timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def recommendation_rows(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "user_id": str(ObjectId()),
+        "book_id": str(ObjectId()),
+        "match_percentage": round(random.uniform(30, 99), 1),
+        "reason": "Matches your favorite genre: Fantasy",
+        "created_at": now,
+    } for _ in range(count)]
+
+
+def exchange_rows(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [{
+        "id": str(ObjectId()),
+        "requester_id": str(ObjectId()),
+        "book_id": str(ObjectId()),
+        "owner_id": str(ObjectId()),
+        "message": "Would you swap this?",
+        "status": "accepted",
+        "created_at": now,
+        "updated_at": now,
+        "book_info": {"book_name": "Dune", "book_author": "Frank Herbert", "book_genre": "Science Fiction"},
+        "response": {"exchange_id": str(ObjectId()), "response_type": "accepted", "message": "Sure", "created_at": now},
+    } for _ in range(count)]
+
+
+async def validated(field, rows) -> bytes:
+    content = await serialize_response(field=field, response_content=rows)
+    return JSONResponse(content).body
+
+
+def trusted(serializer, rows) -> bytes:
+    return serializer.response(rows).body
+
+
+async def measure(name: str, model, rows: List[dict], repeat: int):
+    field = create_response_field(name=f"Response_{name}", type_=List[model])
+    serializer = TrustedSerializer(model)
+    if json.loads(await validated(field, rows)) != json.loads(trusted(serializer, rows)):
+        raise SystemExit(f"{name}: trusted output differs from response_model output")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await validated(field, rows)
+    before = len(rows) * repeat / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        trusted(serializer, rows)
+    after = len(rows) * repeat / (time.perf_counter() - start)
+
+    print(f"{name:16s} response_model {before:12,.0f} rows/s   trusted {after:12,.0f} rows/s   {after / before:5.1f}x")
+
+
+async def main(args):
+    random.seed(args.seed)
+    await measure("notifications", Notification, notification_rows(args.rows), args.repeat)
+    await measure("recommendations", AIRecommendation, recommendation_rows(args.rows), args.repeat)
+    await measure("exchanges", ExchangeDetails, exchange_rows(args.rows), args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""Measure cold-start time of the API and fail when it exceeds a budget.
+
+Profiles `import main` with `python -X importtime`, then starts uvicorn in
+a fresh process and polls until the first HTTP response arrives.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/startup.py --budget-ms 3000
+
+Exits with status 1 when the time to first response exceeds --budget-ms.
+"""
+import argparse
+import http.client
+import socket
+import subprocess
+import sys
+import time
+
+from common import REPO_ROOT
+
+
+def profile_imports(top: int) -> float:
+    """Print the cumulative import time of main and of the modules it imports directly"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import main failed:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Names are indented by two spaces per nesting level after the separator's space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == "main":
+            total_us = int(cumulative)
+        elif depth == 1:
+            children.append((int(cumulative), name.strip()))
+
+    print(f"import main: {total_us / 1000:.1f}ms")
+    for cumulative, name in sorted(children, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+    return total_us / 1000
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(timeout: float) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise SystemExit("uvicorn exited before serving a request")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/")
+                conn.getresponse().read()
+                return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise SystemExit(f"No response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args):
+    profile_imports(args.top)
+    samples = sorted(time_to_first_response(args.timeout) for _ in range(args.runs))
+    median = samples[len(samples) // 2]
+    print(f"time to first response: median {median:.0f}ms over {args.runs} runs (budget {args.budget_ms:.0f}ms)")
+    if median > args.budget_ms:
+        print("Startup budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=3000.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    main(parser.parse_args())
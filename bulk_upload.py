@@ -0,0 +1,171 @@
+import codecs
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, IO, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from archival import listing_expiry
+from cache_bus import cache_bus
+from models.post_book_model import PostBookModel
+
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", 500))
+# Largest single item we buffer while waiting for the rest of it to arrive
+BULK_MAX_ITEM_BYTES = int(os.getenv("BULK_MAX_ITEM_BYTES", 1024 * 1024))
+
+_decoder = json.JSONDecoder()
+
+
+class BulkParseError(ValueError):
+    """The body can no longer be parsed; items after this point are not read"""
+
+
+def _skip_whitespace(buffer: str, position: int) -> int:
+    while position < len(buffer) and buffer[position] in " \t\r\n":
+        position += 1
+    return position
+
+
+async def iter_items(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Yield (item, error) from a JSON array or NDJSON byte stream without holding the whole body.
+
+    The format is picked from the first non-whitespace character. A malformed
+    NDJSON line yields an error for that line only; a malformed JSON array
+    raises BulkParseError since there is no way to resynchronise.
+    """
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    mode = None  # "array" or "ndjson"
+    expect_separator = False
+    finished = False
+
+    async for chunk in chunks:
+        buffer += text.decode(chunk)
+        if mode is None:
+            start = _skip_whitespace(buffer, 0)
+            if start == len(buffer):
+                continue
+            mode = "array" if buffer[start] == "[" else "ndjson"
+            if mode == "array":
+                buffer = buffer[start + 1:]
+
+        if mode == "ndjson":
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+            if len(buffer) > BULK_MAX_ITEM_BYTES:
+                raise BulkParseError(f"Line exceeds {BULK_MAX_ITEM_BYTES} bytes")
+            continue
+
+        position = 0
+        while not finished:
+            position = _skip_whitespace(buffer, position)
+            if position == len(buffer):
+                break
+            if expect_separator or buffer[position] == "]":
+                if buffer[position] == ",":
+                    expect_separator = False
+                    position += 1
+                    continue
+                if buffer[position] == "]":
+                    finished = True
+                    position += 1
+                    break
+                raise BulkParseError(f"Expected ',' or ']' but found {buffer[position]!r}")
+            try:
+                item, position = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Most likely the item is cut off at the chunk boundary; wait for more
+                break
+            expect_separator = True
+            yield item, None
+        buffer = buffer[position:]
+        if len(buffer) > BULK_MAX_ITEM_BYTES:
+            raise BulkParseError(f"Item exceeds {BULK_MAX_ITEM_BYTES} bytes or is not valid JSON")
+        if finished and buffer.strip():
+            raise BulkParseError("Unexpected data after the closing ']'")
+
+    buffer += text.decode(b"", final=True)
+    if mode == "ndjson":
+        if buffer.strip():
+            yield _parse_line(buffer)
+    elif mode == "array" and not finished:
+        raise BulkParseError("Body ended before the closing ']'")
+
+
+def _parse_line(line: str) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except json.JSONDecodeError as e:
+        return None, f"Invalid JSON: {e.msg}"
+
+
+def _write(out: IO[bytes], record: Dict[str, Any]):
+    out.write(json.dumps(record, default=str).encode("utf-8") + b"\n")
+
+
+async def bulk_insert_books(db, items: AsyncIterator[Tuple[Any, Optional[str]]], out: IO[bytes]) -> Dict[str, Any]:
+    """Validate and insert books in unordered chunks, writing one NDJSON result line per item to `out`.
+
+    Result lines carry the item's position in the upload; invalid items are
+    reported as soon as they are seen, so lines are not in upload order.
+    """
+    summary = {"received": 0, "inserted": 0, "invalid": 0, "failed": 0}
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+
+    async def flush():
+        if not pending:
+            return
+        documents = [document for _, document in pending]
+        failed: Dict[int, str] = {}
+        try:
+            await db.books.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("errmsg", "Write failed") for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            failed = {position: str(e) for position in range(len(pending))}
+
+        inserted_ids = []
+        for position, (index, document) in enumerate(pending):
+            if position in failed:
+                summary["failed"] += 1
+                _write(out, {"index": index, "status": "failed", "error": failed[position]})
+            else:
+                summary["inserted"] += 1
+                inserted_ids.append(document["_id"])
+                _write(out, {"index": index, "status": "inserted", "book_id": str(document["_id"])})
+        pending.clear()
+        if inserted_ids:
+            await cache_bus.publish("books", *inserted_ids)
+
+    try:
+        async for item, error in items:
+            index = summary["received"]
+            summary["received"] += 1
+            if error is None and not isinstance(item, dict):
+                error = "Item must be a JSON object"
+            if error is not None:
+                summary["invalid"] += 1
+                _write(out, {"index": index, "status": "invalid", "errors": [{"msg": error}]})
+                continue
+            try:
+                book = PostBookModel(**item)
+            except ValidationError as e:
+                summary["invalid"] += 1
+                _write(out, {"index": index, "status": "invalid", "errors": e.errors()})
+                continue
+
+            document = book.dict()
+            document["bookImages"] = [str(url) for url in document["bookImages"]]
+            document["created_at"] = datetime.utcnow()
+            document["expires_at"] = listing_expiry(document["created_at"])
+            pending.append((index, document))
+            if len(pending) >= BULK_INSERT_CHUNK_SIZE:
+                await flush()
+    except BulkParseError as e:
+        summary["error"] = str(e)
+    await flush()
+    return summary
@@ -0,0 +1,197 @@
+import asyncio
+import inspect
+import os
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+CACHE_BUS_COLLECTION = "cache_invalidations"
+CACHE_BUS_BYTES = int(os.getenv("CACHE_BUS_BYTES", 4 * 1024 * 1024))
+CACHE_BUS_RETRY_SECONDS = float(os.getenv("CACHE_BUS_RETRY_SECONDS", 1))
+# Publishes within this window are merged into one event per collection
+CACHE_BUS_FLUSH_SECONDS = float(os.getenv("CACHE_BUS_FLUSH_SECONDS", 0.05))
+
+# Collections some worker subscribes to. Only these are broadcast, so publishing
+# anything else costs nothing; every worker must agree, so declare them here
+BROADCAST_COLLECTIONS = frozenset({"books", "preferences"})
+
+# Identifies this process so it can skip its own events when tailing
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class CacheInvalidationBus:
+    """Broadcasts "collection X / keys Y changed" events to every worker.
+
+    Events are written to a capped collection that each worker follows with a
+    tailable cursor, so it works on a standalone mongod as well as a replica set.
+    Subscribers are called with the list of changed keys; an empty list means
+    the whole collection should be treated as changed. Only collections in
+    BROADCAST_COLLECTIONS can be subscribed to, and publishing any other is a
+    no-op, so hot write paths do not pay for events nobody reads.
+
+    publish() never waits on I/O: sync subscribers (cheap evictions) run
+    inline, while async subscribers (index refreshes) and the write to the
+    capped collection happen in a background flush that merges everything
+    published within CACHE_BUS_FLUSH_SECONDS.
+
+    The follower reads in natural (insertion) order and resumes after a
+    reconnect by skipping up to the last event it handled. ObjectIds from
+    different workers are not insertion ordered, so they are never compared.
+    If that event has been overwritten in the meantime, every subscribed
+    collection is treated as changed.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        # collection -> changed keys, or None when the whole collection changed
+        self._pending: Dict[str, Optional[Set[str]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def subscribe(self, collection: str, callback: Callable):
+        """Register a sync or async callback(keys) for changes to a collection in BROADCAST_COLLECTIONS"""
+        if collection not in BROADCAST_COLLECTIONS:
+            raise ValueError(f"Add '{collection}' to BROADCAST_COLLECTIONS before subscribing to it")
+        self._subscribers[collection].append(callback)
+
+    async def publish(self, collection: str, *keys):
+        """Evict locally right away and queue the rest; returns without waiting on I/O"""
+        if collection not in BROADCAST_COLLECTIONS:
+            # Nothing in any worker follows it
+            return
+        keys = [str(key) for key in keys]
+        for callback in self._subscribers.get(collection, []):
+            if not inspect.iscoroutinefunction(callback):
+                self._call(callback, keys)
+
+        if not keys:
+            self._pending[collection] = None
+        elif self._pending.get(collection, set()) is not None:
+            self._pending.setdefault(collection, set()).update(keys)
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(CACHE_BUS_FLUSH_SECONDS)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Run async subscribers for queued changes and broadcast them as one event per collection"""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        events = []
+        for collection, keys in pending.items():
+            keys = sorted(keys) if keys is not None else []
+            for callback in self._subscribers.get(collection, []):
+                if inspect.iscoroutinefunction(callback):
+                    await self._call_async(callback, keys)
+            events.append({
+                "collection": collection,
+                "keys": keys,
+                "origin": WORKER_ID,
+                "published_at": datetime.utcnow()
+            })
+        if self._db is None:
+            return
+        try:
+            await self._db[CACHE_BUS_COLLECTION].insert_many(events)
+        except Exception as e:
+            print(f"Cache bus publish error: {str(e)}")
+
+    async def start(self, db):
+        """Create the capped collection and start following it; call from app startup"""
+        self._db = db
+        try:
+            await db.create_collection(CACHE_BUS_COLLECTION, capped=True, size=CACHE_BUS_BYTES)
+        except CollectionInvalid:
+            pass
+        self._task = asyncio.ensure_future(self._follow(await self._latest_id()))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        self._db = None
+
+    async def _latest_id(self):
+        collection = self._db[CACHE_BUS_COLLECTION]
+        # A tailable cursor on an empty capped collection dies immediately, so keep one event in it
+        latest = await collection.find_one(sort=[("$natural", -1)])
+        if latest is None:
+            result = await collection.insert_one({
+                "collection": None, "keys": [], "origin": WORKER_ID, "published_at": datetime.utcnow()
+            })
+            return result.inserted_id
+        return latest["_id"]
+
+    async def _follow(self, last_id):
+        collection = self._db[CACHE_BUS_COLLECTION]
+        while True:
+            try:
+                if await collection.find_one({"_id": last_id}, {"_id": 1}) is None:
+                    # Overwritten while we were away, so events may have been missed
+                    for name in list(self._subscribers):
+                        await self._dispatch(name, [])
+                    last_id = await self._latest_id()
+                # Upper bound on the events stored before last_id
+                stored = await collection.estimated_document_count()
+                skipping, skipped = True, 0
+                cursor = collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive and skipping is not None:
+                    async for event in cursor:
+                        if skipping:
+                            skipped += 1
+                            if event["_id"] == last_id:
+                                skipping = False
+                            elif skipped > stored:
+                                # last_id was overwritten after the check above; start over
+                                skipping = None
+                                break
+                            continue
+                        last_id = event["_id"]
+                        if event.get("origin") != WORKER_ID and event.get("collection"):
+                            await self._dispatch(event["collection"], event.get("keys", []))
+                if skipping is None:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache bus follow error: {str(e)}")
+            await asyncio.sleep(CACHE_BUS_RETRY_SECONDS)
+
+    def _call(self, callback: Callable, keys: List[str]):
+        try:
+            callback(keys)
+        except Exception as e:
+            print(f"Cache bus subscriber error: {str(e)}")
+
+    async def _call_async(self, callback: Callable, keys: List[str]):
+        try:
+            await callback(keys)
+        except Exception as e:
+            print(f"Cache bus subscriber error: {str(e)}")
+
+    async def _dispatch(self, collection: str, keys: List[str]):
+        for callback in self._subscribers.get(collection, []):
+            if inspect.iscoroutinefunction(callback):
+                await self._call_async(callback, keys)
+            else:
+                self._call(callback, keys)
+
+
+# Global cache invalidation bus instance
+cache_bus = CacheInvalidationBus()
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from cache_bus import cache_bus
+from metrics import COALESCED_REQUESTS
+
+# Results are reused for this long after they are computed; 0 only shares in-flight work
+COALESCE_CACHE_SECONDS = float(os.getenv("COALESCE_CACHE_SECONDS", 1.0))
+COALESCE_MAX_ENTRIES = int(os.getenv("COALESCE_MAX_ENTRIES", 1000))
+
+
+def request_key(route: str, params: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """Identical requests map to the same key whatever order their params arrive in"""
+    return (route,) + tuple(sorted((name, value) for name, value in params.items() if value is not None))
+
+
+class Coalescer:
+    """Single-flight for identical concurrent reads, with an optional micro-cache.
+
+    The first request for a key computes the result; requests arriving while
+    it runs await the same future, and requests within the cache window reuse
+    the finished result. Callers share the returned object, so it must not be
+    mutated. Cached results are dropped when a collection they were read from
+    changes on the cache bus; a computation that overlaps such a change is
+    shared with its waiters but not cached.
+    """
+
+    def __init__(self, cache_seconds: float = COALESCE_CACHE_SECONDS, max_entries: int = COALESCE_MAX_ENTRIES):
+        self.cache_seconds = cache_seconds
+        self.max_entries = max_entries
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        # key -> (expires at, collections read, result)
+        self._cache: "OrderedDict[Tuple, Tuple[float, Tuple[str, ...], Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._subscribed = set()
+
+    def _watch(self, collections: Iterable[str]):
+        for collection in collections:
+            if collection not in self._subscribed:
+                self._subscribed.add(collection)
+                cache_bus.subscribe(collection, lambda keys, collection=collection: self.invalidate(collection))
+
+    def invalidate(self, collection: str):
+        self._generations[collection] = self._generations.get(collection, 0) + 1
+        for key in [key for key, (_, depends_on, _) in self._cache.items() if collection in depends_on]:
+            del self._cache[key]
+
+    def _lookup(self, key: Tuple) -> Optional[Tuple[Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        return (entry[2],)
+
+    async def run(
+        self,
+        route: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        depends_on: Tuple[str, ...] = ("books",)
+    ) -> Any:
+        """Return compute()'s result, sharing it with identical requests for `route` and `params`"""
+        self._watch(depends_on)
+        key = request_key(route, params)
+
+        cached = self._lookup(key)
+        if cached is not None:
+            COALESCED_REQUESTS.labels(route, "cached").inc()
+            return cached[0]
+
+        if key in self._inflight:
+            COALESCED_REQUESTS.labels(route, "joined").inc()
+            return await asyncio.shield(self._inflight[key])
+
+        COALESCED_REQUESTS.labels(route, "computed").inc()
+        # Its own task, so a cancelled first caller does not cancel it for those who joined
+        task = self._inflight[key] = asyncio.ensure_future(self._compute(key, compute, depends_on))
+        # Mark retrieved so a failure nobody is left waiting for is not logged
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Tuple, compute: Callable[[], Awaitable[Any]], depends_on: Tuple[str, ...]) -> Any:
+        generations = [self._generations.get(collection, 0) for collection in depends_on]
+        try:
+            result = await compute()
+            unchanged = generations == [self._generations.get(collection, 0) for collection in depends_on]
+            if self.cache_seconds > 0 and unchanged:
+                self._cache[key] = (time.monotonic() + self.cache_seconds, depends_on, result)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            return result
+        finally:
+            del self._inflight[key]
+
+
+# Global coalescer instance
+coalescer = Coalescer()
@@ -0,0 +1,164 @@
+"""Offline item-to-item collaborative filtering over book_interactions.
+
+Builds a sparse user x book matrix of interaction weights, computes cosine
+similarity between books from co-occurring users and stores the top-k
+neighbours per book in `book_neighbors`:
+
+    MONGO_URL=... python collaborative.py --top-k 20
+
+NumPy and SciPy are imported inside the job's functions. Importing this
+module (main.py does, for BOOK_NEIGHBORS) loads neither; the API only reads
+the stored neighbours. NumPy reaches the API process solely through the
+similarity index, which imports it after startup.
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ReplaceOne
+
+BOOK_NEIGHBORS = "book_neighbors"
+NEIGHBORS_TOP_K = int(os.getenv("NEIGHBORS_TOP_K", 20))
+# Events are folded into the sparse matrix this many at a time
+NEIGHBORS_CHUNK_SIZE = int(os.getenv("NEIGHBORS_CHUNK_SIZE", 500000))
+# Books whose similarity columns are computed together; bounds the size of each product
+NEIGHBORS_BLOCK_SIZE = int(os.getenv("NEIGHBORS_BLOCK_SIZE", 512))
+
+INTERACTION_WEIGHTS = {
+    "view": 1.0,
+    "share": 2.0,
+    "favorite": 3.0,
+    "exchange_request": 4.0,
+}
+
+
+async def load_interaction_matrix(db, chunk_size: int = NEIGHBORS_CHUNK_SIZE):
+    """Stream the interaction log into a CSR user x book matrix; returns (matrix, book_ids)"""
+    import numpy as np
+    from scipy import sparse
+
+    users: Dict[str, int] = {}
+    books: Dict[str, int] = {}
+    matrix = None
+    rows: List[int] = []
+    cols: List[int] = []
+    weights: List[float] = []
+
+    def fold():
+        nonlocal matrix
+        if not rows:
+            return
+        # Duplicate (user, book) entries are summed when the COO chunk is converted
+        chunk = sparse.coo_matrix(
+            (np.asarray(weights, dtype=np.float32), (np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))),
+            shape=(len(users), len(books))
+        ).tocsr()
+        if matrix is None:
+            matrix = chunk
+        else:
+            matrix.resize((len(users), len(books)))
+            matrix = matrix + chunk
+        rows.clear()
+        cols.clear()
+        weights.clear()
+
+    cursor = db.book_interactions.find({}, {"_id": 0, "user_id": 1, "book_id": 1, "interaction_type": 1})
+    async for event in cursor.batch_size(10000):
+        weight = INTERACTION_WEIGHTS.get(event.get("interaction_type"))
+        if not weight or not event.get("user_id") or not event.get("book_id"):
+            continue
+        rows.append(users.setdefault(event["user_id"], len(users)))
+        cols.append(books.setdefault(str(event["book_id"]), len(books)))
+        weights.append(weight)
+        if len(rows) >= chunk_size:
+            fold()
+    fold()
+
+    if matrix is None:
+        return sparse.csr_matrix((0, 0), dtype=np.float32), []
+    # Dampen repeated views of the same book by one user
+    matrix.data = np.log1p(matrix.data)
+    book_ids = [None] * len(books)
+    for book_id, column in books.items():
+        book_ids[column] = book_id
+    return matrix, book_ids
+
+
+def top_k_neighbors(matrix, book_ids: List[str], top_k: int = NEIGHBORS_TOP_K, block_size: int = NEIGHBORS_BLOCK_SIZE):
+    """Yield (book_id, [(neighbor_id, score)]) with cosine similarity over co-occurring users"""
+    import numpy as np
+
+    by_book = matrix.T.tocsr()  # book x user
+    norms = np.sqrt(np.asarray(by_book.multiply(by_book).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+
+    for start in range(0, by_book.shape[0], block_size):
+        stop = min(start + block_size, by_book.shape[0])
+        # block x all-books co-occurrence, sparse so only co-occurring pairs are materialised
+        block = (by_book[start:stop] @ by_book.T).tocsr()
+        for offset in range(stop - start):
+            book = start + offset
+            row_start, row_end = block.indptr[offset], block.indptr[offset + 1]
+            neighbors = block.indices[row_start:row_end]
+            scores = block.data[row_start:row_end] / (norms[book] * norms[neighbors])
+            keep = neighbors != book
+            neighbors, scores = neighbors[keep], scores[keep]
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                neighbors, scores = neighbors[best], scores[best]
+            order = np.argsort(-scores, kind="stable")
+            yield book_ids[book], [(book_ids[neighbors[i]], round(float(scores[i]), 6)) for i in order]
+
+
+async def build_book_neighbors(db, top_k: int = NEIGHBORS_TOP_K) -> Dict[str, Any]:
+    started = datetime.utcnow()
+    matrix, book_ids = await load_interaction_matrix(db)
+
+    written = 0
+    batch = []
+    for book_id, neighbors in top_k_neighbors(matrix, book_ids, top_k):
+        if not neighbors:
+            continue
+        batch.append(ReplaceOne(
+            {"_id": book_id},
+            {
+                "_id": book_id,
+                "neighbors": [{"book_id": neighbor, "score": score} for neighbor, score in neighbors],
+                "updated_at": started
+            },
+            upsert=True
+        ))
+        if len(batch) >= 1000:
+            await db[BOOK_NEIGHBORS].bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        await db[BOOK_NEIGHBORS].bulk_write(batch, ordered=False)
+        written += len(batch)
+
+    # Books that lost all neighbours since the last run
+    removed = await db[BOOK_NEIGHBORS].delete_many({"updated_at": {"$lt": started}})
+    return {
+        "users": matrix.shape[0],
+        "books": matrix.shape[1],
+        "pairs": int(matrix.nnz),
+        "written": written,
+        "removed": removed.deleted_count,
+        "seconds": round((datetime.utcnow() - started).total_seconds(), 2)
+    }
+
+
+async def main(args):
+    import dataBase
+
+    result = await build_book_neighbors(dataBase.get_database(), top_k=args.top_k)
+    print(result)
+    dataBase.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=NEIGHBORS_TOP_K)
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
@@ -1,10 +1,105 @@
 import motor.motor_asyncio
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
+from metrics import MongoCommandListener, MongoPoolListener
+from slow_queries import slow_query_log
 
 # Load environment variables from .env
 load_dotenv()
 
 MONGO_URL = os.getenv("MONGO_URL")  # Ensure this matches the .env variable name
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
-db = client.bookwisedb  # Your database name here
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "bookwisedb")
+
+# Connection pool settings; size the pool against the number of uvicorn workers
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))  # 0 waits forever
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 20000))
+# Comma separated, e.g. "zstd,snappy"; zstd needs the zstandard package and snappy python-snappy
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+MONGO_POOL_WARMUP_TIMEOUT_SECONDS = float(os.getenv("MONGO_POOL_WARMUP_TIMEOUT_SECONDS", 10))
+
+pool_listener = MongoPoolListener()
+client = None
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "event_listeners": [MongoCommandListener(), slow_query_log.listener, pool_listener],
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+def get_client():
+    """Return the shared client, creating it on first use outside the app lifecycle (scripts, jobs)"""
+    global client
+    if client is None:
+        client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL, **client_options())
+    return client
+
+
+def use_client(new_client):
+    """Replace the shared client, e.g. with an in-memory stand-in for load tests"""
+    global client
+    client = new_client
+
+
+def get_database():
+    return get_client()[MONGO_DB_NAME]
+
+
+class _Database:
+    """Resolves collections against the current client so modules can keep `from dataBase import db`"""
+
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
+
+    def __getitem__(self, name):
+        return get_database()[name]
+
+
+db = _Database()
+
+
+async def connect():
+    """Create the client on the running loop and warm the pool to minPoolSize; call from app startup"""
+    mongo_client = get_client()
+    await mongo_client.admin.command("ping")
+
+    deadline = time.monotonic() + MONGO_POOL_WARMUP_TIMEOUT_SECONDS
+    while pool_listener.open_connections < MONGO_MIN_POOL_SIZE and time.monotonic() < deadline:
+        # Overlapping pings force distinct connections to be checked out and kept in the pool
+        opened = pool_listener.open_connections
+        await asyncio.gather(*[mongo_client.admin.command("ping") for _ in range(MONGO_MIN_POOL_SIZE - opened)])
+        if pool_listener.open_connections == opened:
+            await asyncio.sleep(0.1)
+
+
+# Set once the unique email index exists; until then register checks for duplicates itself
+email_index_ready = False
+
+
+async def ensure_indexes():
+    """Indexes the application relies on for correctness, e.g. unique emails; call from app startup"""
+    global email_index_ready
+    await get_database().users.create_index("email", unique=True)
+    email_index_ready = True
+
+
+def close():
+    """Close the client and its pool; call from app shutdown"""
+    global client
+    if client is not None:
+        client.close()
+        client = None
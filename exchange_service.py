@@ -0,0 +1,157 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from dataBase import db
+from models.exchange_models import ExchangeStatus
+
+# status -> statuses it may move to; anything else is rejected
+ALLOWED_TRANSITIONS = {
+    ExchangeStatus.PENDING: {ExchangeStatus.ACCEPTED, ExchangeStatus.DECLINED, ExchangeStatus.CANCELLED},
+    ExchangeStatus.ACCEPTED: {ExchangeStatus.COMPLETED, ExchangeStatus.CANCELLED},
+}
+BOOK_INFO_PROJECTION = {"bookName": 1, "authorName": 1, "genre": 1, "bookCondition": 1}
+
+
+class ExchangeError(Exception):
+    pass
+
+
+class ExchangeNotFound(ExchangeError):
+    pass
+
+
+class InvalidTransition(ExchangeError):
+    pass
+
+
+class BookUnavailable(ExchangeError):
+    pass
+
+
+def exchange_error(e: ExchangeError) -> HTTPException:
+    if isinstance(e, ExchangeNotFound):
+        return HTTPException(status_code=404, detail=str(e))
+    return HTTPException(status_code=409, detail=str(e))
+
+
+def book_info_from(book: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    return {
+        "book_name": book.get("bookName", "Unknown Book") if book else "Unknown Book",
+        "book_author": book.get("authorName", "Unknown Author") if book else "Unknown Author",
+        "book_genre": book.get("genre", "") if book else "",
+        "book_condition": book.get("bookCondition", "") if book else ""
+    }
+
+
+def sources_for(target: ExchangeStatus):
+    return [status.value for status, targets in ALLOWED_TRANSITIONS.items() if target in targets]
+
+
+class ExchangeService:
+    """Exchange state machine.
+
+    Every transition is a single find_one_and_update guarded by the statuses
+    the target may be reached from, so concurrent responses cannot both win.
+    Accepting also claims the book with a conditional update; on a replica
+    set both writes share a transaction, retried on transient conflicts; on a
+    standalone server the exchange is put back to pending if the claim fails.
+    """
+
+    def __init__(self):
+        self._transactions: Optional[bool] = None
+
+    async def supports_transactions(self) -> bool:
+        if self._transactions is None:
+            try:
+                hello = await db.client.admin.command("ismaster")
+                self._transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+            except Exception:
+                self._transactions = False
+        return self._transactions
+
+    async def transition(self, exchange_id: str, target: ExchangeStatus, fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Move an exchange to `target` and return it with its `book_info`"""
+        if not sources_for(target):
+            raise InvalidTransition(f"Exchanges cannot be moved to '{target.value}'")
+        if target == ExchangeStatus.ACCEPTED:
+            exchange, book = await self._accept(exchange_id, fields)
+        else:
+            exchange = await self._transition(exchange_id, target, fields)
+            book = None
+            if target == ExchangeStatus.CANCELLED:
+                # Only releases the book if this exchange is the one holding it
+                await db.books.update_one(
+                    {"_id": ObjectId(exchange["book_id"]), "taken_by_exchange": exchange_id},
+                    {"$set": {"is_taken": False}, "$unset": {"taken_at": "", "taken_by_exchange": ""}}
+                )
+
+        if book is not None:
+            exchange["book_info"] = book_info_from(book)
+        elif not exchange.get("book_info"):
+            # Exchanges created before book_info was stored on them
+            book = await db.books.find_one({"_id": ObjectId(exchange["book_id"])}, BOOK_INFO_PROJECTION)
+            exchange["book_info"] = book_info_from(book)
+        return exchange
+
+    async def _transition(self, exchange_id: str, target: ExchangeStatus, fields: Optional[Dict[str, Any]], session=None) -> Dict[str, Any]:
+        updated = await db.exchanges.find_one_and_update(
+            {"_id": ObjectId(exchange_id), "status": {"$in": sources_for(target)}},
+            {"$set": {**(fields or {}), "status": target.value, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if updated is not None:
+            return updated
+        # Only the failure path pays for a second read, to tell the two errors apart
+        current = await db.exchanges.find_one({"_id": ObjectId(exchange_id)}, {"status": 1}, session=session)
+        if current is None:
+            raise ExchangeNotFound("Exchange not found")
+        raise InvalidTransition(f"Cannot move exchange from '{current['status']}' to '{target.value}'")
+
+    async def _claim_book(self, exchange: Dict[str, Any], session=None) -> Dict[str, Any]:
+        book = await db.books.find_one_and_update(
+            {"_id": ObjectId(exchange["book_id"]), "is_taken": {"$ne": True}},
+            {"$set": {"is_taken": True, "taken_at": datetime.utcnow(), "taken_by_exchange": str(exchange["_id"])}},
+            projection=BOOK_INFO_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if book is None:
+            raise BookUnavailable("Book is no longer available for exchange")
+        return book
+
+    async def _accept(self, exchange_id: str, fields: Optional[Dict[str, Any]]):
+        if await self.supports_transactions():
+            async def accept(session):
+                exchange = await self._transition(exchange_id, ExchangeStatus.ACCEPTED, fields, session=session)
+                return exchange, await self._claim_book(exchange, session=session)
+
+            async with await db.client.start_session() as session:
+                try:
+                    # Retried on TransientTransactionError, e.g. a WriteConflict with a concurrent
+                    # accept of the same book; the retry then sees the book taken
+                    return await session.with_transaction(accept)
+                except PyMongoError as e:
+                    if e.has_error_label("TransientTransactionError"):
+                        raise BookUnavailable("Book is being claimed by another exchange, try again") from e
+                    raise
+
+        exchange = await self._transition(exchange_id, ExchangeStatus.ACCEPTED, fields)
+        try:
+            book = await self._claim_book(exchange)
+        except BookUnavailable:
+            await db.exchanges.update_one(
+                {"_id": exchange["_id"], "status": ExchangeStatus.ACCEPTED.value},
+                {"$set": {"status": ExchangeStatus.PENDING.value, "response": None, "updated_at": datetime.utcnow()}}
+            )
+            raise
+        return exchange, book
+
+
+# Global exchange service instance
+exchange_service = ExchangeService()
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "media")
+THUMBNAIL_SIZES = [int(size) for size in os.getenv("THUMBNAIL_SIZES", "160,320,640").split(",") if size.strip()]
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", 2))
+# Files are named by content hash, so a URL never changes meaning and can be cached forever
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Pillow format -> file extension for the originals we accept
+IMAGE_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+IMAGE_URL_PATTERN = re.compile(r"^(?P<base>.*)/images/(?P<digest>[0-9a-f]{64})/original\.(?P<ext>[a-z]+)$")
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def _original_path(digest: str, ext: str) -> str:
+    return os.path.join(MEDIA_ROOT, "originals", digest[:2], f"{digest}.{ext}")
+
+
+def _thumbnail_path(digest: str, size: int) -> str:
+    return os.path.join(MEDIA_ROOT, "thumbnails", str(size), digest[:2], f"{digest}.jpg")
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _process_image(data: bytes, digest: str, sizes: List[int]) -> str:
+    """Runs in the process pool: validate, store the original and render thumbnails; returns the extension"""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            probe.verify()
+        image = Image.open(io.BytesIO(data))
+    except Exception as e:
+        raise InvalidImage(f"Not a readable image: {str(e)}")
+    ext = IMAGE_FORMATS.get(image.format)
+    if ext is None:
+        raise InvalidImage(f"Unsupported image format: {image.format}")
+
+    original_path = _original_path(digest, ext)
+    if not os.path.exists(original_path):
+        _write_atomic(original_path, data)
+
+    image = image.convert("RGB")
+    for size in sizes:
+        path = _thumbnail_path(digest, size)
+        if os.path.exists(path):
+            continue
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+        _write_atomic(path, buffer.getvalue())
+    return ext
+
+
+def thumbnail_urls(image_url: str) -> Dict[str, str]:
+    """Thumbnail URLs per size for an uploaded image URL; external URLs have none"""
+    match = IMAGE_URL_PATTERN.match(str(image_url))
+    if not match:
+        return {}
+    return {str(size): f"{match['base']}/images/{match['digest']}/{size}.jpg" for size in THUMBNAIL_SIZES}
+
+
+class ImageStore:
+    """Content-addressed image storage under MEDIA_ROOT.
+
+    Originals are stored once per SHA-256 digest; Pillow work happens in a
+    process pool so request handlers only hash and await.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    async def save(self, data: bytes) -> Tuple[str, str, bool]:
+        """Store an image and its thumbnails; returns (digest, extension, already_stored)"""
+        if not data:
+            raise InvalidImage("Empty upload")
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self.find_original(digest)
+        if existing and all(os.path.exists(_thumbnail_path(digest, size)) for size in THUMBNAIL_SIZES):
+            return digest, existing[1], True
+        loop = asyncio.get_event_loop()
+        ext = await loop.run_in_executor(self._executor(), _process_image, data, digest, THUMBNAIL_SIZES)
+        return digest, ext, existing is not None
+
+    def find_original(self, digest: str) -> Optional[Tuple[str, str]]:
+        for ext in IMAGE_FORMATS.values():
+            path = _original_path(digest, ext)
+            if os.path.exists(path):
+                return path, ext
+        return None
+
+    def resolve(self, digest: str, filename: str) -> Optional[Tuple[str, str]]:
+        """Map /images/{digest}/{filename} to (path, media type), or None if there is no such file"""
+        if not re.fullmatch(r"[0-9a-f]{64}", digest):
+            return None
+        name, _, ext = filename.partition(".")
+        if name == "original":
+            path = _original_path(digest, ext) if ext in MEDIA_TYPES else None
+        elif name.isdigit() and int(name) in THUMBNAIL_SIZES and ext == "jpg":
+            path = _thumbnail_path(digest, int(name))
+        else:
+            path = None
+        if path is None or not os.path.exists(path):
+            return None
+        return path, MEDIA_TYPES[ext]
+
+
+# Global image store instance
+image_store = ImageStore()
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from dataBase import db
+from ai_service import FALLBACK_INSIGHTS
+
+# Insights younger than the TTL are served as-is; until TTL + stale window they are
+# still served but refreshed in the background; anything older is regenerated inline.
+INSIGHTS_CACHE_TTL_SECONDS = int(os.getenv("INSIGHTS_CACHE_TTL_SECONDS", 6 * 60 * 60))
+INSIGHTS_CACHE_STALE_SECONDS = int(os.getenv("INSIGHTS_CACHE_STALE_SECONDS", 24 * 60 * 60))
+INSIGHTS_CACHE_MAX_ENTRIES = int(os.getenv("INSIGHTS_CACHE_MAX_ENTRIES", 10000))
+
+
+def insights_fingerprint(user_id: str, reading_stats: Dict[str, Any], interactions: List[Dict[str, Any]]) -> str:
+    """Hash the inputs of an insights prompt so unchanged inputs map to the same cache entry"""
+    stats = {k: v for k, v in reading_stats.items() if k not in ("_id", "updated_at")}
+    recent = [
+        {k: v for k, v in interaction.items() if k != "_id"}
+        for interaction in interactions[-20:]
+    ]
+    payload = json.dumps([user_id, stats, recent], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class InsightsCache:
+    def __init__(self, collection_name: str = "ai_insights_cache"):
+        self.collection_name = collection_name
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def collection(self):
+        return db[self.collection_name]
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get_or_generate(
+        self,
+        user_id: str,
+        reading_stats: Dict[str, Any],
+        interactions: List[Dict[str, Any]],
+        generate: Callable[[], Awaitable[str]]
+    ) -> Tuple[str, datetime, bool]:
+        """Return (insights, generated_at, cached) for the given inputs"""
+        key = insights_fingerprint(user_id, reading_stats, interactions)
+        entry = await self._lookup(key)
+
+        if entry:
+            age = (datetime.utcnow() - entry["generated_at"]).total_seconds()
+            if age < INSIGHTS_CACHE_TTL_SECONDS:
+                return entry["insights"], entry["generated_at"], True
+            if age < INSIGHTS_CACHE_TTL_SECONDS + INSIGHTS_CACHE_STALE_SECONDS:
+                if key not in self._inflight:
+                    asyncio.ensure_future(self._refresh_in_background(key, user_id, generate))
+                return entry["insights"], entry["generated_at"], True
+
+        entry = await self._refresh(key, user_id, generate)
+        return entry["insights"], entry["generated_at"], False
+
+    async def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry:
+            self._entries.move_to_end(key)
+            return entry
+
+        doc = await self.collection.find_one({"_id": key})
+        if not doc:
+            return None
+        entry = {"insights": doc["insights"], "generated_at": doc["generated_at"]}
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > INSIGHTS_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    async def _refresh(self, key: str, user_id: str, generate: Callable[[], Awaitable[str]]) -> Dict[str, Any]:
+        # Concurrent misses for the same inputs share a single LLM call. It runs as its
+        # own task, so a caller that is cancelled does not cancel it for the others
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._generate(key, user_id, generate))
+            # Mark retrieved so a failure nobody is left waiting for is not logged
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    async def _generate(self, key: str, user_id: str, generate: Callable[[], Awaitable[str]]) -> Dict[str, Any]:
+        try:
+            insights = await generate()
+            entry = {"insights": insights, "generated_at": datetime.utcnow()}
+            if insights != FALLBACK_INSIGHTS:
+                self._remember(key, entry)
+                await self._persist(key, user_id, entry)
+            return entry
+        except Exception as e:
+            print(f"Insights cache refresh error: {str(e)}")
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _refresh_in_background(self, key: str, user_id: str, generate: Callable[[], Awaitable[str]]):
+        try:
+            await self._refresh(key, user_id, generate)
+        except Exception:
+            pass  # Already logged; the stale entry keeps being served
+
+    async def _persist(self, key: str, user_id: str, entry: Dict[str, Any]):
+        expires_at = entry["generated_at"] + timedelta(
+            seconds=INSIGHTS_CACHE_TTL_SECONDS + INSIGHTS_CACHE_STALE_SECONDS
+        )
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "user_id": user_id,
+                    "insights": entry["insights"],
+                    "generated_at": entry["generated_at"],
+                    "expires_at": expires_at
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Insights cache persist error: {str(e)}")
+
+
+# Global insights cache instance
+insights_cache = InsightsCache()
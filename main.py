@@ -1,7 +1,8 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, File, UploadFile
 from pydantic import HttpUrl
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse, Response, FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from typing import List, Optional, Dict, Any
 from models.register_model import RegisterUser 
 from models.login_model import LoginUser
@@ -11,17 +12,43 @@ from models.post_book_model import PostBookModel
 from models.update_book_model import UpdateBookModel
 from models.exchange_models import ExchangeRequest, ExchangeResponse, ExchangeDetails, ExchangeStatus
 from models.preference_models import UserPreferences, AIRecommendation, BookTrending
-from models.stats_models import ReadingStats, BookInteraction, ReadingHabits, InteractionType
+from models.stats_models import ReadingStats, BookInteraction, BookInteractionBatch, ReadingHabits, InteractionType, MAX_INTERACTION_BATCH
 from models.notification_models import Notification, NotificationType, NotificationPreferences
 from dataBase import db 
+import dataBase
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from collections import Counter
 from utils import hash_password, verify_password, create_access_token
 from ai_service import ai_service
+from insights_cache import insights_cache
+from metrics import PrometheusMiddleware, render_metrics
+from slow_queries import slow_query_log, SLOW_QUERY_THRESHOLD_MS
+from cache_bus import cache_bus
+from search_index import search_index, encode_cursor, decode_cursor
+from suggest_index import suggest_index
+from similarity_index import similarity_index
+from preference_index import preference_index
+from rate_limit import ai_admission, RateLimited
+from coalesce import coalescer
+from stats_projector import stats_projector
+from serialization import trusted_response
+from bulk_upload import bulk_insert_books, iter_items
+from image_store import image_store, thumbnail_urls, InvalidImage, IMAGE_MAX_BYTES, IMAGE_CACHE_CONTROL
+from archival import archiver, listing_expiry, find_with_archive, BOOKS_ARCHIVE, EXCHANGES_ARCHIVE
+from collaborative import BOOK_NEIGHBORS
+from exchange_service import exchange_service, book_info_from, ExchangeError, exchange_error
 import json
+import asyncio
+import os
+import tempfile
 
 app = FastAPI(title="BookWise API", version="2.0.0")
 
+AI_WARMUP_ON_STARTUP = os.getenv("AI_WARMUP_ON_STARTUP", "1") == "1"
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,44 +57,173 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware)
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, please retry later", "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.on_event("startup")
+async def startup():
+    try:
+        await dataBase.connect()
+    except Exception as e:
+        print(f"Database connection error: {str(e)}")
+    stats_projector.start(db)
+    try:
+        await dataBase.ensure_indexes()
+    except Exception as e:
+        # Existing duplicate emails block the unique index; register falls back to checking first
+        print(f"User index creation error: {str(e)}")
+    try:
+        await insights_cache.ensure_indexes()
+    except Exception as e:
+        print(f"Insights index creation error: {str(e)}")
+    try:
+        await stats_projector.ensure_indexes()
+    except Exception as e:
+        print(f"Reading stats index creation error: {str(e)}")
+    try:
+        await slow_query_log.start(db)
+    except Exception as e:
+        print(f"Slow query log error: {str(e)}")
+    try:
+        await cache_bus.start(db)
+    except Exception as e:
+        print(f"Cache bus error: {str(e)}")
+    try:
+        await search_index.start(db)
+    except Exception as e:
+        print(f"Search index error: {str(e)}")
+    try:
+        await suggest_index.start(db)
+    except Exception as e:
+        print(f"Suggest index error: {str(e)}")
+    try:
+        await similarity_index.start(db)
+    except Exception as e:
+        print(f"Similarity index error: {str(e)}")
+    try:
+        await preference_index.start(db)
+    except Exception as e:
+        print(f"Preference index error: {str(e)}")
+    try:
+        await archiver.start(db)
+    except Exception as e:
+        print(f"Archiver error: {str(e)}")
+    if AI_WARMUP_ON_STARTUP:
+        # Runs after startup returns, so the first requests are not held up by the AI import
+        asyncio.ensure_future(ai_service.warm_up())
+
+@app.on_event("shutdown")
+async def shutdown():
+    await slow_query_log.stop()
+    await cache_bus.stop()
+    await archiver.stop()
+    await stats_projector.stop()
+    await preference_index.stop()
+    image_store.shutdown()
+    similarity_index.close()
+    dataBase.close()
 
 @app.get("/")
 def root():
     return RedirectResponse(url="/docs")
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics for this worker process"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/admin/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=100),
+    since_minutes: Optional[int] = Query(None, ge=1)
+):
+    """Slowest query shapes recorded above SLOW_QUERY_THRESHOLD_MS, by total time spent"""
+    try:
+        offenders = await slow_query_log.top_offenders(limit=limit, since_minutes=since_minutes)
+        return {
+            "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+            "total_shapes": len(offenders),
+            "offenders": offenders
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 #get books serialization method
 def serialize_book(book) -> dict:
+    images = book.get("bookImages", [])
     return {
         "id": str(book["_id"]),
         "bookName": book.get("bookName"),
         "authorName": book.get("authorName"),
         "genre": book.get("genre", ""),  # Added genre field
         "description": book.get("description"),
-        "bookImages": book.get("bookImages", []),
+        "bookImages": images,
+        # Per image, thumbnail URLs by size; empty for externally hosted images
+        "thumbnails": [thumbnail_urls(url) for url in images],
         "created_at": book.get("created_at"),
         "user_id": book.get("user_id"),
         "bookCondition": book.get("bookCondition"),
         "is_taken": book.get("is_taken", False)
     }
 
+@app.post("/images")
+async def upload_image(request: Request, file: UploadFile = File(...)):
+    """Store an image once per content hash and render its thumbnails; use the returned url in bookImages"""
+    data = await file.read(IMAGE_MAX_BYTES + 1)
+    if len(data) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {IMAGE_MAX_BYTES} bytes")
+    try:
+        digest, ext, deduplicated = await image_store.save(data)
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error storing image: {str(e)}")
+
+    url = f"{str(request.base_url).rstrip('/')}/images/{digest}/original.{ext}"
+    return {
+        "message": "Image uploaded successfully",
+        "image_id": digest,
+        "url": url,
+        "thumbnails": thumbnail_urls(url),
+        "deduplicated": deduplicated
+    }
+
+@app.get("/images/{digest}/{filename}")
+async def get_image(digest: str, filename: str):
+    resolved = image_store.resolve(digest, filename)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path, media_type = resolved
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": IMAGE_CACHE_CONTROL})
+
 # Existing Authentication Routes
 @app.post("/register")
 async def register_user(user: RegisterUser):
     try:
-        await db.command("ping")
-        existing_user = await db.users.find_one({"email": user.email})
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Email already exists")
-        
         user_dict = user.dict()
         user_dict['password'] = hash_password(user_dict['password'])
         user_dict['created_at'] = datetime.utcnow()
 
+        # The unique index on email rejects duplicates, so a lookup is only needed without it
+        if not dataBase.email_index_ready and await db.users.find_one({"email": user.email}, {"_id": 1}):
+            raise HTTPException(status_code=400, detail="Email already exists")
         result = await db.users.insert_one(user_dict)
-        created_user = await db.users.find_one({"_id": result.inserted_id})
-        created_user["id"] = str(created_user["_id"])
-        del created_user["_id"]
+        await cache_bus.publish("users", result.inserted_id)
+        created_user = dict(user_dict)
+        created_user["id"] = str(created_user.pop("_id"))
         return created_user
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already exists")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -123,15 +279,16 @@ async def update_user_profile(user_id: str, updated_data: UpdateUserProfile):
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    result = await db.users.update_one(
+    updated_user = await db.users.find_one_and_update(
         {"_id": ObjectId(user_id)},
-        {"$set": update_dict}
+        {"$set": update_dict},
+        return_document=ReturnDocument.AFTER
     )
 
-    if result.matched_count == 0:
+    if updated_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    await cache_bus.publish("users", user_id)
 
-    updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
     updated_user["id"] = str(updated_user["_id"])
     del updated_user["_id"]
 
@@ -147,21 +304,15 @@ async def request_exchange(exchange: ExchangeRequest):
         if book.get("is_taken", False):
             raise HTTPException(status_code=400, detail="Book is not available for exchange")
 
+        # Book details are stored on the exchange so later transitions need not look the book up
+        book_info = book_info_from(book)
+        
         exchange_dict = exchange.dict()
         exchange_dict["status"] = "pending"  # Ensure status is set
         exchange_dict["created_at"] = datetime.utcnow()
-        result = await db.exchanges.insert_one(exchange_dict)
-        
-        # Get the created exchange with full details
-        created_exchange = await db.exchanges.find_one({"_id": result.inserted_id})
-        
-        # Get book details
-        book_info = {
-            "book_name": book.get("bookName", "Unknown Book"),
-            "book_author": book.get("authorName", "Unknown Author"),
-            "book_genre": book.get("genre", ""),
-            "book_condition": book.get("bookCondition", "")
-        }
+        exchange_dict["book_info"] = book_info
+        await db.exchanges.insert_one(exchange_dict)
+        created_exchange = exchange_dict
         
         # Get requester details
         requester = await db.users.find_one({"_id": ObjectId(exchange.requester_id)})
@@ -201,6 +352,8 @@ async def request_exchange(exchange: ExchangeRequest):
             data={"exchange_id": exchange_response["id"], "book_name": book_info["book_name"]}
         )
         await db.notifications.insert_one(notification.dict())
+        await cache_bus.publish("exchanges", exchange_response["id"])
+        await cache_bus.publish("notifications", exchange.owner_id)
         
         return {
             "message": "Exchange request created successfully",
@@ -214,7 +367,8 @@ async def get_user_exchanges(
     user_id: str,
     status: Optional[ExchangeStatus] = None,
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    include_archived: bool = False
 ):
     try:
         query = {"$or": [{"requester_id": user_id}, {"owner_id": user_id}]}
@@ -222,8 +376,8 @@ async def get_user_exchanges(
             query["status"] = status
 
         exchanges = []
-        cursor = db.exchanges.find(query).skip(skip).limit(limit).sort("created_at", -1)
-        async for exchange in cursor:
+        page = await find_with_archive(db, "exchanges", EXCHANGES_ARCHIVE, query, skip, limit, include_archived)
+        for exchange in page:
             # Get book details
             book = await db.books.find_one({"_id": ObjectId(exchange["book_id"])})
             book_info = {
@@ -256,6 +410,7 @@ async def get_user_exchanges(
                 "status": exchange["status"],
                 "created_at": exchange["created_at"],
                 "response": exchange.get("response"),
+                "archived": "archived_at" in exchange,
                 # Enhanced data
                 "book_info": book_info,
                 "requester_info": requester_info,
@@ -271,70 +426,88 @@ async def get_user_exchanges(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _serialize_exchange(exchange: dict) -> dict:
+    return {
+        "id": str(exchange["_id"]),
+        "requester_id": exchange["requester_id"],
+        "book_id": exchange["book_id"],
+        "owner_id": exchange["owner_id"],
+        "message": exchange["message"],
+        "status": exchange["status"],
+        "created_at": exchange["created_at"],
+        "response": exchange.get("response"),
+        "book_info": exchange["book_info"]
+    }
+
 @app.put("/exchanges/{exchange_id}/respond")
 async def respond_to_exchange(exchange_id: str, response: ExchangeResponse):
+    if response.response_type not in (ExchangeStatus.ACCEPTED, ExchangeStatus.DECLINED):
+        raise HTTPException(status_code=400, detail="Response must be 'accepted' or 'declined'")
     try:
-        result = await db.exchanges.update_one(
-            {"_id": ObjectId(exchange_id)},
-            {"$set": {"status": response.response_type, "response": response.dict()}}
+        updated_exchange = await exchange_service.transition(
+            exchange_id, response.response_type, {"response": response.dict()}
         )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Exchange not found")
-            
-        updated_exchange = await db.exchanges.find_one({"_id": ObjectId(exchange_id)})
-        
-        # Get book details
-        book = await db.books.find_one({"_id": ObjectId(updated_exchange["book_id"])})
-        book_info = {
-            "book_name": book.get("bookName", "Unknown Book") if book else "Unknown Book",
-            "book_author": book.get("authorName", "Unknown Author") if book else "Unknown Author",
-            "book_genre": book.get("genre", "") if book else "",
-            "book_condition": book.get("bookCondition", "") if book else ""
-        }
-        
-        exchange_response = {
-            "id": str(updated_exchange["_id"]),
-            "requester_id": updated_exchange["requester_id"],
-            "book_id": updated_exchange["book_id"],
-            "owner_id": updated_exchange["owner_id"],
-            "message": updated_exchange["message"],
-            "status": updated_exchange["status"],
-            "created_at": updated_exchange["created_at"],
-            "response": updated_exchange.get("response"),
-            "book_info": book_info
-        }
+        await cache_bus.publish("exchanges", exchange_id)
+        exchange_response = _serialize_exchange(updated_exchange)
+        book_name = exchange_response["book_info"]["book_name"]
         
         if response.response_type == ExchangeStatus.ACCEPTED:
-            await db.books.update_one(
-                {"_id": ObjectId(updated_exchange["book_id"])},
-                {"$set": {"is_taken": True}}
-            )
+            await cache_bus.publish("books", updated_exchange["book_id"])
             
             # Create notification for requester with book name
             notification = Notification(
                 user_id=updated_exchange["requester_id"],
                 type=NotificationType.EXCHANGE_RESPONSE,
                 title="Exchange Request Accepted",
-                message=f"Your request for '{book_info['book_name']}' has been accepted!",
-                data={"exchange_id": exchange_id, "book_name": book_info["book_name"]}
+                message=f"Your request for '{book_name}' has been accepted!",
+                data={"exchange_id": exchange_id, "book_name": book_name}
             )
-            await db.notifications.insert_one(notification.dict())
-        elif response.response_type == ExchangeStatus.REJECTED:
-            # Create notification for rejection
+        else:
+            # Create notification for the declined request
             notification = Notification(
                 user_id=updated_exchange["requester_id"],
                 type=NotificationType.EXCHANGE_RESPONSE,
                 title="Exchange Request Declined",
-                message=f"Your request for '{book_info['book_name']}' was declined.",
-                data={"exchange_id": exchange_id, "book_name": book_info["book_name"]}
+                message=f"Your request for '{book_name}' was declined.",
+                data={"exchange_id": exchange_id, "book_name": book_name}
             )
-            await db.notifications.insert_one(notification.dict())
+        await db.notifications.insert_one(notification.dict())
+        await cache_bus.publish("notifications", updated_exchange["requester_id"])
         
         return {
-            "message": f"Exchange request {response.response_type.lower()}",
+            "message": f"Exchange request {response.response_type.value}",
+            "exchange": exchange_response
+        }
+    except ExchangeError as e:
+        raise exchange_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/exchanges/{exchange_id}/complete")
+async def complete_exchange(exchange_id: str):
+    try:
+        updated_exchange = await exchange_service.transition(exchange_id, ExchangeStatus.COMPLETED)
+        await cache_bus.publish("exchanges", exchange_id)
+        await stats_projector.record_completed_exchange(updated_exchange)
+        exchange_response = _serialize_exchange(updated_exchange)
+        book_name = exchange_response["book_info"]["book_name"]
+
+        notification = Notification(
+            user_id=updated_exchange["owner_id"],
+            type=NotificationType.EXCHANGE_COMPLETED,
+            title="Exchange Completed",
+            message=f"The exchange of '{book_name}' has been completed.",
+            data={"exchange_id": exchange_id, "book_name": book_name}
+        )
+        await db.notifications.insert_one(notification.dict())
+        await cache_bus.publish("notifications", updated_exchange["owner_id"])
+
+        return {
+            "message": "Exchange completed",
             "exchange": exchange_response
         }
+    except ExchangeError as e:
+        raise exchange_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -350,6 +523,7 @@ async def set_user_preferences(user_id: str, preferences: UserPreferences):
             {"$set": preferences_dict},
             upsert=True
         )
+        await cache_bus.publish("preferences", user_id)
         
         updated_preferences = await db.preferences.find_one({"user_id": user_id})
         return updated_preferences
@@ -368,6 +542,7 @@ async def get_user_preferences(user_id: str):
 
 @app.post("/ai/generate-recommendations/{user_id}")
 async def generate_ai_recommendations(user_id: str):
+    lease = await ai_admission.admit("ai_recommendations", user_id)
     try:
         # Get user preferences
         preferences = await db.preferences.find_one({"user_id": user_id})
@@ -375,6 +550,7 @@ async def generate_ai_recommendations(user_id: str):
             # Create default preferences if not found
             default_preferences = UserPreferences(user_id=user_id)
             await db.preferences.insert_one(default_preferences.dict())
+            await cache_bus.publish("preferences", user_id)
             preferences = default_preferences.dict()
             
         # Get user's reading history
@@ -402,6 +578,7 @@ async def generate_ai_recommendations(user_id: str):
             await db.recommendations.delete_many({"user_id": user_id})
             recommendations_dicts = [rec.dict() for rec in ai_recommendations]
             await db.recommendations.insert_many(recommendations_dicts)
+            await cache_bus.publish("recommendations", user_id)
             
         return {
             "message": f"Generated {len(ai_recommendations)} AI-powered recommendations",
@@ -409,6 +586,8 @@ async def generate_ai_recommendations(user_id: str):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        lease.release()
 
 @app.get("/users/{user_id}/ai-recommendations", response_model=List[AIRecommendation])
 async def get_ai_recommendations(
@@ -424,7 +603,7 @@ async def get_ai_recommendations(
         
         async for rec in cursor:
             recommendations.append(rec)
-        return recommendations
+        return trusted_response(AIRecommendation, recommendations)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -433,10 +612,8 @@ async def get_ai_recommendations(
 async def get_reading_statistics(user_id: str):
     try:
         stats = await db.reading_stats.find_one({"user_id": user_id})
-        if not stats:
-            stats = ReadingStats(user_id=user_id)
-            await db.reading_stats.insert_one(stats.dict())
-        return stats
+        # Stats are written by the projector as events arrive; a user without any has defaults
+        return stats or ReadingStats(user_id=user_id, updated_at=datetime.utcnow())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -488,96 +665,78 @@ async def get_ai_reading_insights(user_id: str):
         async for interaction in db.book_interactions.find({"user_id": user_id}).sort("timestamp", -1).limit(20):
             interactions.append(interaction)
             
-        # Generate AI insights
-        insights = await ai_service.generate_reading_insights(
-            user_id=user_id,
-            reading_stats=reading_stats,
-            interactions=interactions
+        # Generate AI insights, reusing the cached text while the inputs are unchanged
+        insights, generated_at, cached = await insights_cache.get_or_generate(
+            user_id,
+            reading_stats,
+            interactions,
+            lambda: ai_service.generate_reading_insights(
+                user_id=user_id,
+                reading_stats=reading_stats,
+                interactions=interactions
+            )
         )
         
         return {
             "user_id": user_id,
             "insights": insights,
-            "generated_at": datetime.utcnow()
+            "generated_at": generated_at,
+            "cached": cached
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _fetch_chat_preferences(user_id: str) -> dict:
+    preferences = await db.preferences.find_one({"user_id": user_id})
+    if not preferences:
+        preferences = {
+            "favorite_genres": [], 
+            "favorite_authors": [],
+            "reading_preferences": {}
+        }
+    return preferences
+
+async def _fetch_chat_books(query: dict, limit: int = 0) -> List[dict]:
+    books = []
+    async for book in db.books.find(query).limit(limit):
+        books.append({
+            "id": str(book["_id"]),
+            "bookName": book.get("bookName", ""),
+            "authorName": book.get("authorName", ""),
+            "genre": book.get("genre", ""),
+            "description": book.get("description", "")
+        })
+    return books
+
+async def _load_chat_context(user_id: str):
+    """Fetch preferences, the user's posted books and other available books concurrently"""
+    return await asyncio.gather(
+        _fetch_chat_preferences(user_id),
+        _fetch_chat_books({"user_id": user_id}),
+        _fetch_chat_books({"user_id": {"$ne": user_id}, "is_taken": False}, limit=15)
+    )
+
 @app.post("/ai/chat/{user_id}")
 async def ai_chatbot_recommendations(user_id: str, message: dict):
     """AI chatbot that considers user's posted books and preferences"""
+    lease = await ai_admission.admit("ai_chat", user_id)
     try:
         user_message = message.get("message", "")
         
-        # Get user preferences
-        preferences = await db.preferences.find_one({"user_id": user_id})
-        if not preferences:
-            preferences = {
-                "favorite_genres": [], 
-                "favorite_authors": [],
-                "reading_preferences": {}
-            }
-        
-        # Get user's posted books
-        user_books = []
-        async for book in db.books.find({"user_id": user_id}):
-            user_books.append({
-                "id": str(book["_id"]),
-                "bookName": book.get("bookName", ""),
-                "authorName": book.get("authorName", ""),
-                "genre": book.get("genre", ""),
-                "description": book.get("description", "")
-            })
-        
-        # Get other available books (not user's own books)
-        available_books = []
-        async for book in db.books.find({
-            "user_id": {"$ne": user_id}, 
-            "is_taken": False
-        }).limit(15):
-            available_books.append({
-                "id": str(book["_id"]),
-                "bookName": book.get("bookName", ""),
-                "authorName": book.get("authorName", ""),
-                "genre": book.get("genre", ""),
-                "description": book.get("description", "")
-            })
+        preferences, user_books, available_books = await _load_chat_context(user_id)
         
         # AI chat response
-        if not ai_service.is_available or not ai_service.model:
+        if not await ai_service.load():
             return {
                 "response": f"Hi! I can see you have {len(user_books)} books posted. I'm here to help you discover similar books or answer questions about your reading preferences!",
                 "user_books_count": len(user_books)
             }
         
-        # Create comprehensive chat prompt
-        prompt = f"""
-        You are a friendly AI book assistant for BookWise. The user has asked: "{user_message}"
-        
-        USER'S POSTED BOOKS ({len(user_books)} books):
-        {json.dumps(user_books, indent=2)}
-        
-        USER'S PREFERENCES:
-        - Favorite Genres: {preferences.get('favorite_genres', [])}
-        - Favorite Authors: {preferences.get('favorite_authors', [])}
-        - Reading Preferences: {preferences.get('reading_preferences', {})}
-        
-        AVAILABLE BOOKS TO RECOMMEND:
-        {json.dumps(available_books[:10], indent=2)}
-        
-        Instructions:
-        1. Reference their posted books to understand their taste
-        2. Use their preferences to make relevant suggestions
-        3. Give book name, author, and ONE line description for recommendations
-        4. Be conversational and encouraging
-        5. Keep response under 150 words
-        6. If they ask about their books, mention specific titles
-        """
-        
-        response = ai_service.model.generate_content(prompt)
+        prompt = ai_service.create_chat_prompt(user_message, user_books, preferences, available_books)
+        response_text = await ai_service.generate_chat_response(prompt)
         
         return {
-            "response": response.text.strip(),
+            "response": response_text,
             "user_books_count": len(user_books),
             "available_books_count": len(available_books)
         }
@@ -587,38 +746,215 @@ async def ai_chatbot_recommendations(user_id: str, message: dict):
             "response": f"Hi! I can see you've posted some great books. I'm here to help you discover new reads and chat about your book preferences! What would you like to know?",
             "error": str(e)
         }
+    finally:
+        lease.release()
+
+def _sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+@app.post("/ai/chat/{user_id}/stream")
+async def ai_chatbot_stream(user_id: str, message: dict):
+    """Streaming variant of the AI chatbot, forwarding Gemini chunks as server-sent events"""
+    user_message = message.get("message", "")
+    # Admitted before the response starts so a rejection is still a plain 429
+    lease = await ai_admission.admit("ai_chat", user_id)
+
+    async def event_stream():
+        try:
+            preferences, user_books, available_books = await _load_chat_context(user_id)
+            yield _sse_event({
+                "type": "meta",
+                "user_books_count": len(user_books),
+                "available_books_count": len(available_books)
+            })
+
+            if not await ai_service.load():
+                yield _sse_event({
+                    "type": "chunk",
+                    "text": f"Hi! I can see you have {len(user_books)} books posted. I'm here to help you discover similar books or answer questions about your reading preferences!"
+                })
+            else:
+                prompt = ai_service.create_chat_prompt(user_message, user_books, preferences, available_books)
+                async for text in ai_service.stream_chat_response(prompt):
+                    yield _sse_event({"type": "chunk", "text": text})
+        except Exception as e:
+            yield _sse_event({
+                "type": "error",
+                "text": "Hi! I can see you've posted some great books. I'm here to help you discover new reads and chat about your book preferences! What would you like to know?",
+                "error": str(e)
+            })
+        finally:
+            lease.release()
+        yield _sse_event({"type": "done"})
+
+    # The generator's finally only runs once it has started; the background task
+    # also covers clients that disconnect first (release is idempotent)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(lease.release)
+    )
+
+async def _load_authors():
+    # Get all unique authors from books collection
+    authors = await db.books.distinct("authorName")
+    authors = [author for author in authors if author and author.strip()]  # Remove empty/null authors
+    authors.sort()  # Sort alphabetically
+    
+    return {
+        "message": f"Found {len(authors)} unique authors",
+        "total_authors": len(authors),
+        "authors": authors
+    }
 
 @app.get("/books/authors")
 async def get_all_authors():
     """Get all unique authors from books"""
     try:
-        # Get all unique authors from books collection
-        authors = await db.books.distinct("authorName")
-        authors = [author for author in authors if author and author.strip()]  # Remove empty/null authors
-        authors.sort()  # Sort alphabetically
-        
-        return {
-            "message": f"Found {len(authors)} unique authors",
-            "total_authors": len(authors),
-            "authors": authors
-        }
+        return await coalescer.run("/books/authors", {}, _load_authors)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _load_genres():
+    # Get all unique genres from books collection
+    genres = await db.books.distinct("genre")
+    genres = [genre for genre in genres if genre and genre.strip()]  # Remove empty/null genres
+    genres.sort()  # Sort alphabetically
+    
+    return {
+        "message": f"Found {len(genres)} unique genres",
+        "total_genres": len(genres),
+        "genres": genres
+    }
+
 @app.get("/books/genres")
 async def get_all_genres():
     """Get all unique genres from books"""
     try:
-        # Get all unique genres from books collection
-        genres = await db.books.distinct("genre")
-        genres = [genre for genre in genres if genre and genre.strip()]  # Remove empty/null genres
-        genres.sort()  # Sort alphabetically
-        
+        return await coalescer.run("/books/genres", {}, _load_genres)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/books/search")
+async def search_books(
+    q: str = Query(..., min_length=1),
+    available: Optional[bool] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Full-text search over title, author, genre and description ranked with BM25"""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        hits, total_matches, next_after = search_index.search(q, available=available, limit=limit, after=after)
+
+        books_by_id = {}
+        if hits:
+            async for book in db.books.find({"_id": {"$in": [ObjectId(book_id) for book_id, _ in hits]}}):
+                books_by_id[str(book["_id"])] = book
+
+        books = []
+        for book_id, score in hits:
+            if book_id in books_by_id:
+                book = serialize_book(books_by_id[book_id])
+                book["score"] = score
+                books.append(book)
+
         return {
-            "message": f"Found {len(genres)} unique genres",
-            "total_genres": len(genres),
-            "genres": genres
+            "message": f"Found {total_matches} books matching '{q}'",
+            "query": q,
+            "total_matches": total_matches,
+            "returned_books": len(books),
+            "next_cursor": encode_cursor(*next_after) if next_after else None,
+            "books": books
         }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching books: {str(e)}")
+
+@app.get("/books/suggest")
+async def suggest_books(
+    prefix: str = Query(..., min_length=1),
+    kind: str = Query("title", regex="^(title|author)$"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Typeahead suggestions for book titles or authors, most listed first"""
+    suggestions = suggest_index.suggest(prefix, kind=kind, limit=limit)
+    return {
+        "prefix": prefix,
+        "kind": kind,
+        "suggestions": suggestions
+    }
+
+# Declared before /books/{book_id} so "trending" is not taken for a book id
+@app.get("/books/trending", response_model=List[BookTrending])
+async def get_trending_books(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=50)
+):
+    async def load_trending():
+        trending_books = []
+        cursor = db.books.aggregate([
+            {
+                "$lookup": {
+                    "from": "book_interactions",
+                    "localField": "_id",
+                    "foreignField": "book_id",
+                    "as": "interactions"
+                }
+            },
+            {
+                "$addFields": {
+                    "views_count": {
+                        "$size": {
+                            "$filter": {
+                                "input": "$interactions",
+                                "as": "interaction",
+                                "cond": {"$eq": ["$$interaction.interaction_type", "view"]}
+                            }
+                        }
+                    },
+                    "exchange_requests_count": {
+                        "$size": {
+                            "$filter": {
+                                "input": "$interactions",
+                                "as": "interaction",
+                                "cond": {"$eq": ["$$interaction.interaction_type", "exchange_request"]}
+                            }
+                        }
+                    }
+                }
+            },
+            {
+                "$addFields": {
+                    "trend_score": {
+                        "$add": [
+                            {"$multiply": ["$views_count", 1]},
+                            {"$multiply": ["$exchange_requests_count", 3]}
+                        ]
+                    }
+                }
+            },
+            {"$sort": {"trend_score": -1}},
+            {"$skip": skip},
+            {"$limit": limit}
+        ])
+        
+        async for book in cursor:
+            book["book_id"] = str(book["_id"])
+            trending_books.append(book)
+        return trending_books
+
+    try:
+        trending_books = await coalescer.run(
+            "/books/trending", {"skip": skip, "limit": limit}, load_trending,
+            # Interactions are not watched: they arrive constantly, and the micro-cache
+            # window already bounds how stale the counts can be
+            depends_on=("books",)
+        )
+        return trusted_response(BookTrending, trending_books)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -772,20 +1108,23 @@ async def get_user_notifications(
             
         async for notif in cursor:
             notifications.append(notif)
-        return notifications
+        return trusted_response(Notification, notifications)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str):
     try:
-        result = await db.notifications.update_one(
+        notification = await db.notifications.find_one_and_update(
             {"_id": ObjectId(notification_id)},
-            {"$set": {"read": True}}
+            # read_at starts the retention TTL; $min keeps the first read time
+            {"$set": {"read": True}, "$min": {"read_at": datetime.utcnow()}},
+            projection={"user_id": 1}
         )
         
-        if result.matched_count == 0:
+        if notification is None:
             raise HTTPException(status_code=404, detail="Notification not found")
+        await cache_bus.publish("notifications", notification.get("user_id"))
         return {"message": "Notification marked as read"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -803,23 +1142,74 @@ async def track_book_interaction(book_id: str, interaction: BookInteraction):
         interaction_dict["timestamp"] = datetime.utcnow()
         
         await db.book_interactions.insert_one(interaction_dict)
+        await cache_bus.publish("book_interactions", interaction.user_id)
         
         if interaction.interaction_type == InteractionType.VIEW:
             await db.books.update_one(
                 {"_id": ObjectId(book_id)},
                 {"$inc": {"view_count": 1}}
             )
+            # No "books" event: nothing cached depends on view_count, and views are the hottest write
+        # After every write of our own; projection never raises, so a retry cannot double-count
+        await stats_projector.record_interactions([(interaction.user_id, interaction.interaction_type, book)])
         return {"message": "Interaction tracked successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/interactions/batch")
+async def track_book_interactions_batch(batch: BookInteractionBatch):
+    """Track many interactions in one round trip; events for unknown books are rejected individually"""
+    if not 1 <= len(batch.interactions) <= MAX_INTERACTION_BATCH:
+        raise HTTPException(status_code=422, detail=f"A batch must hold 1 to {MAX_INTERACTION_BATCH} interactions")
+    try:
+        book_ids = {i.book_id for i in batch.interactions if ObjectId.is_valid(i.book_id)}
+        existing = {}
+        async for book in db.books.find({"_id": {"$in": [ObjectId(b) for b in book_ids]}}, {"authorName": 1, "genre": 1}):
+            existing[str(book["_id"])] = book
+
+        now = datetime.utcnow()
+        documents = []
+        rejected = []
+        view_counts = Counter()
+        for index, interaction in enumerate(batch.interactions):
+            if interaction.book_id not in existing:
+                rejected.append({"index": index, "book_id": interaction.book_id, "error": "Book not found"})
+                continue
+            interaction_dict = interaction.dict()
+            # Keep client timestamps for events queued offline; otherwise stamp them now
+            if "timestamp" not in interaction.__fields_set__:
+                interaction_dict["timestamp"] = now
+            documents.append(interaction_dict)
+            if interaction.interaction_type == InteractionType.VIEW:
+                view_counts[interaction.book_id] += 1
+
+        if documents:
+            await db.book_interactions.insert_many(documents)
+            await cache_bus.publish("book_interactions", *{d["user_id"] for d in documents})
+            await stats_projector.record_interactions(
+                (d["user_id"], d["interaction_type"], existing[d["book_id"]]) for d in documents
+            )
+        if view_counts:
+            await db.books.bulk_write([
+                UpdateOne({"_id": ObjectId(book_id)}, {"$inc": {"view_count": count}})
+                for book_id, count in view_counts.items()
+            ], ordered=False)
+
+        return {
+            "message": f"Tracked {len(documents)} interactions",
+            "accepted": len(documents),
+            "rejected": rejected
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Existing Book Routes
 @app.get("/books/")
 async def get_all_books(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000)
 ):
-    try:
+    async def load_books():
         books_cursor = db.books.find().skip(skip).limit(limit).sort("created_at", -1)
         books = []
         async for book in books_cursor:
@@ -835,6 +1225,9 @@ async def get_all_books(
             "limit": limit,
             "books": books
         }
+
+    try:
+        return await coalescer.run("/books/", {"skip": skip, "limit": limit}, load_books)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching books: {str(e)}")
 
@@ -878,7 +1271,10 @@ async def add_new_book(book: PostBookModel):
         if "bookImages" in book_data:
             book_data["bookImages"] = [str(url) for url in book_data["bookImages"]]
         book_data["created_at"] = datetime.utcnow()
+        book_data["expires_at"] = listing_expiry(book_data["created_at"])
         result = await db.books.insert_one(book_data)
+        await cache_bus.publish("books", result.inserted_id)
+        preference_index.notify_new_book(book_data)
         return {
             "message": "Book added successfully",
             "book_id": str(result.inserted_id)
@@ -886,6 +1282,28 @@ async def add_new_book(book: PostBookModel):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding book: {str(e)}")
 
+@app.post("/books/bulk")
+async def add_books_bulk(request: Request):
+    """Insert many books from a JSON array or NDJSON body, returning one NDJSON result line per item"""
+    # Results are spooled to disk past 1MB so large uploads keep memory bounded
+    results = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        summary = await bulk_insert_books(db, iter_items(request.stream()), results)
+    except Exception as e:
+        results.close()
+        raise HTTPException(status_code=500, detail=f"Error adding books: {str(e)}")
+    results.write(json.dumps({"summary": summary}).encode("utf-8") + b"\n")
+    results.seek(0)
+
+    def read_results():
+        try:
+            for block in iter(lambda: results.read(64 * 1024), b""):
+                yield block
+        finally:
+            results.close()
+
+    return StreamingResponse(read_results(), media_type="application/x-ndjson")
+
 @app.put("/updateBook/{book_id}")
 async def update_book(book_id: str, updated_data: UpdateBookModel):
     try:
@@ -898,15 +1316,26 @@ async def update_book(book_id: str, updated_data: UpdateBookModel):
         if not update_fields:
             raise HTTPException(status_code=400, detail="No fields provided to update.")
 
-        result = await db.books.update_one(
+        update = {"$set": update_fields}
+        if update_fields.get("is_taken") is False:
+            update["$unset"] = {"taken_at": "", "taken_by_exchange": ""}
+        updated_book = await db.books.find_one_and_update(
             {"_id": ObjectId(book_id)},
-            {"$set": update_fields}
+            update,
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.matched_count == 0:
+        if updated_book is None:
             raise HTTPException(status_code=404, detail="Book not found.")
+        if updated_book.get("is_taken") and "taken_at" not in updated_book:
+            # Archival counts TAKEN_RETENTION_DAYS from taken_at; keep the first one if it was already taken
+            updated_book["taken_at"] = datetime.utcnow()
+            await db.books.update_one(
+                {"_id": updated_book["_id"], "taken_at": {"$exists": False}},
+                {"$set": {"taken_at": updated_book["taken_at"]}}
+            )
+        await cache_bus.publish("books", book_id)
 
-        updated_book = await db.books.find_one({"_id": ObjectId(book_id)})
         updated_book["book_id"] = str(updated_book["_id"])
         del updated_book["_id"]
 
@@ -914,6 +1343,8 @@ async def update_book(book_id: str, updated_data: UpdateBookModel):
             "message": "Book updated successfully.",
             "book": updated_book
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating book: {str(e)}")
 
@@ -930,24 +1361,107 @@ async def delete_book(book_id: str):
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Book not found")
+        await cache_bus.publish("books", book_id)
             
         return {"message": "Book deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting book: {str(e)}")
 
-@app.get("/getBooks")
-async def get_featured_books():
+@app.get("/books/{book_id}/also-interested")
+async def get_also_interested_books(
+    book_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    available_only: bool = True
+):
+    """Books that users who interacted with this book also interacted with, from the offline neighbours job"""
     try:
-        books_cursor = db.books.find()
+        neighbors = await db[BOOK_NEIGHBORS].find_one({"_id": book_id})
+        scores = {n["book_id"]: n["score"] for n in neighbors["neighbors"]} if neighbors else {}
+
+        query = {"_id": {"$in": [ObjectId(n) for n in scores if ObjectId.is_valid(n)]}}
+        if available_only:
+            query["is_taken"] = False
         books = []
-        async for book in books_cursor:
-            books.append(serialize_book(book))
+        async for book in db.books.find(query):
+            book_data = serialize_book(book)
+            book_data["score"] = scores[book_data["id"]]
+            books.append(book_data)
+        books.sort(key=lambda b: b["score"], reverse=True)
 
         return {
-            "message": "Books fetched successfully",
-            "total_books": len(books),
+            "message": f"Found {len(books[:limit])} books users also showed interest in",
+            "book_id": book_id,
+            "books": books[:limit]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching related books: {str(e)}")
+
+@app.get("/books/{book_id}/similar")
+async def get_similar_books(
+    book_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    available_only: bool = True
+):
+    """Books with similar titles, authors, genres and descriptions, by TF-IDF cosine similarity"""
+    if not similarity_index.ready:
+        raise HTTPException(status_code=503, detail="Similarity index is still building, retry shortly")
+    try:
+        neighbors = similarity_index.similar(book_id, k=limit, available_only=available_only)
+        if neighbors is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        scores = dict(neighbors)
+
+        books = []
+        async for book in db.books.find({"_id": {"$in": [ObjectId(n) for n in scores]}}):
+            book_data = serialize_book(book)
+            book_data["score"] = scores[book_data["id"]]
+            books.append(book_data)
+        books.sort(key=lambda b: b["score"], reverse=True)
+
+        return {
+            "message": f"Found {len(books)} similar books",
+            "book_id": book_id,
             "books": books
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching similar books: {str(e)}")
+
+@app.post("/books/{book_id}/renew")
+async def renew_book_listing(book_id: str):
+    """Extend a listing by another LISTING_TTL_DAYS, restoring it if it has already expired"""
+    try:
+        book = await archiver.renew_book(ObjectId(book_id))
+        if book is None:
+            raise HTTPException(status_code=404, detail="Book not found or already taken")
+        await cache_bus.publish("books", book_id)
+        return {
+            "message": "Listing renewed successfully",
+            "book_id": book_id,
+            "expiry_date": book["expires_at"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error renewing book: {str(e)}")
+
+async def _load_featured_books():
+    books_cursor = db.books.find()
+    books = []
+    async for book in books_cursor:
+        books.append(serialize_book(book))
+
+    return {
+        "message": "Books fetched successfully",
+        "total_books": len(books),
+        "books": books
+    }
+
+@app.get("/getBooks")
+async def get_featured_books():
+    try:
+        return await coalescer.run("/getBooks", {}, _load_featured_books)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching books: {str(e)}")
 
@@ -955,13 +1469,18 @@ async def get_featured_books():
 async def get_book_details(book_id: str):
     try:
         book = await db.books.find_one({"_id": ObjectId(book_id)})
+        archived = False
+        if not book:
+            # Expired and long-taken listings are moved out of the hot collection
+            book = await db[BOOKS_ARCHIVE].find_one({"_id": ObjectId(book_id)})
+            archived = True
         if not book:
             raise HTTPException(status_code=404, detail="Book not found")
 
         user = await db.users.find_one({"_id": ObjectId(book["owner_id"])}) if "owner_id" in book else None
 
         posted_date = book.get("created_at", datetime.utcnow())
-        expiry_date = posted_date + timedelta(days=30)
+        expiry_date = book.get("expires_at") or posted_date + timedelta(days=30)
 
         book_detail = {
             "book_id": str(book["_id"]),
@@ -977,69 +1496,12 @@ async def get_book_details(book_id: str):
             "expiry_date": expiry_date,
             "pictures": book.get("bookImages", []),
             "book_condition": book.get("bookCondition"),
-            "status": "available" if not book.get("is_taken", False) else "not available"
+            "status": "available" if not book.get("is_taken", False) and not archived else "not available",
+            "archived": archived
         }
 
         return book_detail
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching book detail: {str(e)}")
-
-@app.get("/books/trending", response_model=List[BookTrending])
-async def get_trending_books(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=50)
-):
-    try:
-        trending_books = []
-        cursor = db.books.aggregate([
-            {
-                "$lookup": {
-                    "from": "book_interactions",
-                    "localField": "_id",
-                    "foreignField": "book_id",
-                    "as": "interactions"
-                }
-            },
-            {
-                "$addFields": {
-                    "views_count": {
-                        "$size": {
-                            "$filter": {
-                                "input": "$interactions",
-                                "as": "interaction",
-                                "cond": {"$eq": ["$$interaction.interaction_type", "view"]}
-                            }
-                        }
-                    },
-                    "exchange_requests_count": {
-                        "$size": {
-                            "$filter": {
-                                "input": "$interactions",
-                                "as": "interaction",
-                                "cond": {"$eq": ["$$interaction.interaction_type", "exchange_request"]}
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "$addFields": {
-                    "trend_score": {
-                        "$add": [
-                            {"$multiply": ["$views_count", 1]},
-                            {"$multiply": ["$exchange_requests_count", 3]}
-                        ]
-                    }
-                }
-            },
-            {"$sort": {"trend_score": -1}},
-            {"$skip": skip},
-            {"$limit": limit}
-        ])
-        
-        async for book in cursor:
-            book["book_id"] = str(book["_id"])
-            trending_books.append(BookTrending(**book))
-        return trending_books
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Metrics are kept per process; scrape every uvicorn worker separately.
+REQUEST_LATENCY = Histogram(
+    "bookwise_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "bookwise_mongo_command_duration_seconds",
+    "MongoDB command latency by collection and operation",
+    ["collection", "operation", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+AI_CALL_LATENCY = Histogram(
+    "bookwise_ai_call_duration_seconds",
+    "Generative model call latency by operation and outcome",
+    ["operation", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "bookwise_mongo_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled MongoDB connection",
+    ["outcome"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+MONGO_POOL_OPEN_CONNECTIONS = Gauge(
+    "bookwise_mongo_pool_open_connections",
+    "Open MongoDB connections across all pools"
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "bookwise_mongo_pool_checked_out_connections",
+    "MongoDB connections currently checked out of the pool"
+)
+EVENT_LOOP_QUEUE_DEPTH = Gauge(
+    "bookwise_event_loop_ready_callbacks",
+    "Callbacks waiting in the event loop ready queue when the metrics were scraped"
+)
+
+ADMISSION_DECISIONS = Counter(
+    "bookwise_admission_decisions_total",
+    "AI endpoint admission decisions by endpoint and outcome",
+    ["endpoint", "outcome"]
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "bookwise_admission_in_flight",
+    "Requests holding a concurrency slot",
+    ["limit"]
+)
+ADMISSION_QUEUED = Gauge(
+    "bookwise_admission_queued",
+    "Requests waiting for a concurrency slot",
+    ["limit"]
+)
+ADMISSION_TRACKED_BUCKETS = Gauge(
+    "bookwise_admission_tracked_buckets",
+    "Per-user token buckets currently held in memory"
+)
+
+COALESCED_REQUESTS = Counter(
+    "bookwise_coalesced_requests_total",
+    "Coalesced read requests by route and whether they computed, joined an in-flight computation or hit the micro-cache",
+    ["route", "outcome"]
+)
+
+# Route template of the request being served; Motor copies it into its executor threads
+current_route: ContextVar[str] = ContextVar("current_route", default="")
+
+
+def route_template(scope) -> str:
+    """Map a request to the path template of the route that serves it"""
+    app = scope.get("app")
+    if app is None:
+        return "unmatched"
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request latency until the response body is fully sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+        route = route_template(scope)
+        token = current_route.set(route)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_route.reset(token)
+            REQUEST_LATENCY.labels(
+                scope["method"], route, str(status["code"])
+            ).observe(time.perf_counter() - start)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command listener timing every command by collection and operation"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, object], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection", "")
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (collection or "", event.command_name)
+
+    def succeeded(self, event):
+        self._observe(event, "success")
+
+    def failed(self, event):
+        self._observe(event, "failure")
+
+    def _observe(self, event, outcome: str):
+        with self._lock:
+            collection, operation = self._pending.pop(
+                (event.request_id, event.connection_id), ("", event.command_name)
+            )
+        MONGO_COMMAND_LATENCY.labels(collection, operation, outcome).observe(event.duration_micros / 1e6)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """pymongo pool listener tracking pool size and checkout wait time.
+
+    A checkout starts and finishes on the same driver thread, so the start
+    time is kept in a thread local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.open_connections = 0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._observe_wait("success")
+        MONGO_POOL_CHECKED_OUT.inc()
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(str(event.reason))
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.dec()
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+        MONGO_POOL_OPEN_CONNECTIONS.inc()
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+        MONGO_POOL_OPEN_CONNECTIONS.dec()
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def _observe_wait(self, outcome: str):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            MONGO_POOL_CHECKOUT_WAIT.labels(outcome).observe(time.perf_counter() - started)
+            self._local.started = None
+
+
+def observe_ai_call(operation: str, outcome: str, started: float):
+    AI_CALL_LATENCY.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus text exposition of every metric in this process"""
+    try:
+        loop = asyncio.get_event_loop()
+        EVENT_LOOP_QUEUE_DEPTH.set(len(getattr(loop, "_ready", ())))
+    except RuntimeError:
+        pass
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, AnyHttpUrl
 from typing import List, Optional
 from datetime import datetime
 
@@ -9,6 +9,6 @@ class PostBookModel(BaseModel):
     genre: str  # Added genre field
     description: Optional[str] = None
     bookCondition: str
-    bookImages: List[HttpUrl] = []
+    bookImages: List[AnyHttpUrl] = []
     is_taken: Optional[bool] = False  
     created_at: Optional[datetime] = None 
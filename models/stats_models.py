@@ -25,6 +25,12 @@ class BookInteraction(BaseModel):
     timestamp: datetime = datetime.utcnow()
     metadata: Optional[dict] = None
 
+MAX_INTERACTION_BATCH = 200
+
+class BookInteractionBatch(BaseModel):
+    # 1 to MAX_INTERACTION_BATCH items; checked by the endpoint, since conlist's bounds differ between pydantic versions
+    interactions: List[BookInteraction]
+
 class ReadingHabits(BaseModel):
     user_id: str
     average_books_per_month: float
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, AnyHttpUrl
 from typing import Optional, List, Dict
 
 class UpdateBookModel(BaseModel):
@@ -7,5 +7,5 @@ class UpdateBookModel(BaseModel):
     genre: Optional[str]  # Added genre field
     description: Optional[str] = None
     bookCondition: Optional[str]
-    bookImages: Optional[List[HttpUrl]] = []
+    bookImages: Optional[List[AnyHttpUrl]] = []
     is_taken: Optional[bool] = False 
\ No newline at end of file
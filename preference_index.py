@@ -0,0 +1,149 @@
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from cache_bus import cache_bus
+from models.notification_models import Notification, NotificationType
+from suggest_index import normalize
+
+# Notifications are written with one insert_many per this many recipients
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", 500))
+# New listings waiting to be fanned out; further listings are dropped when full
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", 1000))
+PREFERENCE_PROJECTION = {"_id": 0, "user_id": 1, "favorite_genres": 1, "favorite_authors": 1}
+
+
+class PreferenceIndex:
+    """Reverse index from favourite genre and author to the users who chose them.
+
+    Built from `preferences` at startup and kept current through "preferences"
+    events on the cache bus, so finding who to tell about a new listing costs
+    O(matching users) rather than a scan of every user. Notifications are
+    queued and written in batches by a background task on the worker that
+    accepted the listing; they are best effort and lost if that worker stops
+    before the queue drains.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._genres: Dict[str, Set[str]] = defaultdict(set)
+        self._authors: Dict[str, Set[str]] = defaultdict(set)
+        # user_id -> (genre keys, author keys) currently indexed for that user
+        self._users: Dict[str, tuple] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, db):
+        """Build the index and start the notification sender; call from app startup"""
+        self._db = db
+        self._queue = asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+        cache_bus.subscribe("preferences", self.refresh)
+        await self.rebuild()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def rebuild(self):
+        self._genres.clear()
+        self._authors.clear()
+        self._users.clear()
+        async for preferences in self._db.preferences.find({}, PREFERENCE_PROJECTION):
+            self.upsert(preferences)
+
+    async def refresh(self, user_ids: List[str]):
+        """Re-read changed users' preferences; no ids means every user changed"""
+        if not user_ids:
+            await self.rebuild()
+            return
+        found = set()
+        async for preferences in self._db.preferences.find({"user_id": {"$in": list(user_ids)}}, PREFERENCE_PROJECTION):
+            self.upsert(preferences)
+            found.add(preferences["user_id"])
+        for user_id in user_ids:
+            if user_id not in found:
+                self.remove(user_id)
+
+    def upsert(self, preferences: Dict[str, Any]):
+        user_id = preferences["user_id"]
+        self.remove(user_id)
+        genres = {key for key in map(normalize, preferences.get("favorite_genres") or []) if key}
+        authors = {key for key in map(normalize, preferences.get("favorite_authors") or []) if key}
+        for key in genres:
+            self._genres[key].add(user_id)
+        for key in authors:
+            self._authors[key].add(user_id)
+        if genres or authors:
+            self._users[user_id] = (genres, authors)
+
+    def remove(self, user_id: str):
+        genres, authors = self._users.pop(user_id, (set(), set()))
+        for index, keys in ((self._genres, genres), (self._authors, authors)):
+            for key in keys:
+                users = index[key]
+                users.discard(user_id)
+                if not users:
+                    del index[key]
+
+    def matches(self, book: Dict[str, Any]) -> Set[str]:
+        """Users whose favourite genres or authors include this book's, excluding its owner"""
+        users = set(self._genres.get(normalize(book.get("genre")), ()))
+        users |= self._authors.get(normalize(book.get("authorName")), set())
+        users.discard(book.get("user_id"))
+        return users
+
+    def notify_new_book(self, book: Dict[str, Any]):
+        """Queue a BOOK_AVAILABLE fan-out for a new listing without waiting for it"""
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(book)
+        except asyncio.QueueFull:
+            print(f"Book notification queue full, skipping book {book.get('_id')}")
+
+    async def _run(self):
+        while True:
+            book = await self._queue.get()
+            try:
+                await self.send_book_available(book)
+            except Exception as e:
+                print(f"Book notification error: {str(e)}")
+
+    async def send_book_available(self, book: Dict[str, Any]) -> int:
+        users = self.matches(book)
+        if not users:
+            return 0
+        # Users who switched this notification type off
+        muted = {
+            preferences["user_id"]
+            async for preferences in self._db.notification_preferences.find(
+                {"user_id": {"$in": list(users)}, f"notification_types.{NotificationType.BOOK_AVAILABLE.value}": False},
+                {"_id": 0, "user_id": 1}
+            )
+        }
+        recipients = sorted(users - muted)
+        book_id = str(book["_id"])
+        now = datetime.utcnow()
+        for start in range(0, len(recipients), NOTIFY_BATCH_SIZE):
+            batch = recipients[start:start + NOTIFY_BATCH_SIZE]
+            await self._db.notifications.insert_many([
+                Notification(
+                    user_id=user_id,
+                    type=NotificationType.BOOK_AVAILABLE,
+                    title="New Book Available",
+                    message=f"'{book['bookName']}' by {book['authorName']} was just listed",
+                    data={"book_id": book_id, "book_name": book["bookName"], "genre": book.get("genre")},
+                    created_at=now
+                ).dict()
+                for user_id in batch
+            ], ordered=False)
+            await cache_bus.publish("notifications", *batch)
+        return len(recipients)
+
+
+# Global preference index instance
+preference_index = PreferenceIndex()
@@ -0,0 +1,163 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from metrics import ADMISSION_DECISIONS, ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_TRACKED_BUCKETS
+
+# Per-user token buckets: sustained requests per minute and burst size, per endpoint
+AI_CHAT_PER_MINUTE = float(os.getenv("AI_CHAT_PER_MINUTE", 10))
+AI_CHAT_BURST = int(os.getenv("AI_CHAT_BURST", 5))
+AI_RECOMMEND_PER_MINUTE = float(os.getenv("AI_RECOMMEND_PER_MINUTE", 2))
+AI_RECOMMEND_BURST = int(os.getenv("AI_RECOMMEND_BURST", 2))
+# Shared by every AI endpoint in this worker
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", 8))
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", 16))
+AI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AI_QUEUE_TIMEOUT_SECONDS", 10))
+# Idle buckets beyond this many are evicted oldest first
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", 100000))
+
+
+class RateLimited(Exception):
+    """The request was not admitted; retry_after is in whole seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, per_second: float, burst: int, now: float):
+        self.per_second = per_second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token; returns 0 on success or the seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.per_second
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class ConcurrencyLimit:
+    """Semaphore with a bounded wait queue; callers beyond the queue are turned away at once"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            # Created lazily so it binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked():
+            if self.queued >= self.max_queue:
+                raise RateLimited("queue_full", 1)
+            self.queued += 1
+            ADMISSION_QUEUED.labels(self.name).inc()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise RateLimited("queue_timeout", 1)
+            finally:
+                self.queued -= 1
+                ADMISSION_QUEUED.labels(self.name).dec()
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).inc()
+
+    def release(self):
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+        self._semaphore.release()
+
+
+class Lease:
+    """A slot held by an admitted request; release() is safe to call more than once"""
+
+    def __init__(self, limit: ConcurrencyLimit):
+        self._limit = limit
+
+    def release(self):
+        if self._limit is not None:
+            self._limit.release()
+            self._limit = None
+
+
+class AdmissionController:
+    """In-process admission control: a token bucket per (endpoint, user) and a shared concurrency limit.
+
+    State is per worker, so the effective limits scale with the worker count.
+    The clock is injectable so tests can advance time without sleeping.
+    """
+
+    def __init__(
+        self,
+        policies: Dict[str, Tuple[float, int]],
+        concurrency: ConcurrencyLimit,
+        clock: Callable[[], float] = time.monotonic,
+        max_buckets: int = RATE_LIMIT_MAX_BUCKETS
+    ):
+        # endpoint -> (requests per minute, burst)
+        self.policies = policies
+        self.concurrency = concurrency
+        self.clock = clock
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def _bucket(self, endpoint: str, user_id: str, now: float) -> TokenBucket:
+        key = (endpoint, user_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            per_minute, burst = self.policies[endpoint]
+            bucket = self._buckets[key] = TokenBucket(per_minute / 60, burst, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            ADMISSION_TRACKED_BUCKETS.set(len(self._buckets))
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def admit(self, endpoint: str, user_id: str) -> Lease:
+        """Admit a request or raise RateLimited; the caller must release the returned lease"""
+        now = self.clock()
+        bucket = self._bucket(endpoint, user_id, now)
+        wait = bucket.take(now)
+        if wait:
+            ADMISSION_DECISIONS.labels(endpoint, "rate_limited").inc()
+            raise RateLimited("rate_limited", max(1, math.ceil(wait)))
+        try:
+            await self.concurrency.acquire()
+        except RateLimited as e:
+            # The request never ran, so it should not count against the user
+            bucket.refund()
+            ADMISSION_DECISIONS.labels(endpoint, e.reason).inc()
+            raise
+        ADMISSION_DECISIONS.labels(endpoint, "admitted").inc()
+        return Lease(self.concurrency)
+
+
+# Global AI admission controller instance
+ai_admission = AdmissionController(
+    policies={
+        "ai_chat": (AI_CHAT_PER_MINUTE, AI_CHAT_BURST),
+        "ai_recommendations": (AI_RECOMMEND_PER_MINUTE, AI_RECOMMEND_BURST),
+    },
+    concurrency=ConcurrencyLimit("ai", AI_MAX_CONCURRENCY, AI_MAX_QUEUE, AI_QUEUE_TIMEOUT_SECONDS)
+)
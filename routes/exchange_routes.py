@@ -4,6 +4,11 @@ from bson import ObjectId
 from datetime import datetime
 from models.exchange_models import ExchangeRequest, ExchangeResponse, ExchangeDetails, ExchangeStatus
 from dataBase import db
+from cache_bus import cache_bus
+from stats_projector import stats_projector
+from serialization import trusted_response
+from archival import find_with_archive, EXCHANGES_ARCHIVE
+from exchange_service import exchange_service, ExchangeError, exchange_error
 
 router = APIRouter(prefix="/exchanges", tags=["exchanges"])
 
@@ -21,6 +26,7 @@ async def request_exchange(exchange: ExchangeRequest):
         exchange_dict = exchange.dict()
         exchange_dict["created_at"] = datetime.utcnow()
         result = await db.exchanges.insert_one(exchange_dict)
+        await cache_bus.publish("exchanges", result.inserted_id)
         
         # Get created exchange
         created_exchange = await db.exchanges.find_one({"_id": result.inserted_id})
@@ -36,7 +42,8 @@ async def get_user_exchanges(
     user_id: str,
     status: Optional[ExchangeStatus] = None,
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    include_archived: bool = False
 ):
     try:
         query = {
@@ -49,74 +56,50 @@ async def get_user_exchanges(
             query["status"] = status
 
         exchanges = []
-        cursor = db.exchanges.find(query).skip(skip).limit(limit).sort("created_at", -1)
+        page = await find_with_archive(db, "exchanges", EXCHANGES_ARCHIVE, query, skip, limit, include_archived)
         
-        async for exchange in cursor:
+        for exchange in page:
             exchange["id"] = str(exchange["_id"])
             del exchange["_id"]
             exchanges.append(exchange)
             
-        return exchanges
+        return trusted_response(ExchangeDetails, exchanges)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{exchange_id}/respond", response_model=ExchangeDetails)
 async def respond_to_exchange(exchange_id: str, response: ExchangeResponse):
+    if response.response_type not in (ExchangeStatus.ACCEPTED, ExchangeStatus.DECLINED):
+        raise HTTPException(status_code=400, detail="Response must be 'accepted' or 'declined'")
     try:
-        # Update exchange status
-        result = await db.exchanges.update_one(
-            {"_id": ObjectId(exchange_id)},
-            {
-                "$set": {
-                    "status": response.response_type,
-                    "response": response.dict()
-                }
-            }
+        # Accepting also claims the book, atomically with the status change
+        updated_exchange = await exchange_service.transition(
+            exchange_id, response.response_type, {"response": response.dict()}
         )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Exchange not found")
-            
-        # Get updated exchange
-        updated_exchange = await db.exchanges.find_one({"_id": ObjectId(exchange_id)})
+        await cache_bus.publish("exchanges", exchange_id)
+        if response.response_type == ExchangeStatus.ACCEPTED:
+            await cache_bus.publish("books", updated_exchange["book_id"])
+
         updated_exchange["id"] = str(updated_exchange["_id"])
         del updated_exchange["_id"]
-        
-        # Update book status if exchange is accepted
-        if response.response_type == ExchangeStatus.ACCEPTED:
-            await db.books.update_one(
-                {"_id": ObjectId(updated_exchange["book_id"])},
-                {"$set": {"is_taken": True}}
-            )
-        
         return updated_exchange
+    except ExchangeError as e:
+        raise exchange_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{exchange_id}/complete", response_model=ExchangeDetails)
 async def complete_exchange(exchange_id: str):
     try:
-        # Verify exchange exists and is accepted
-        exchange = await db.exchanges.find_one({"_id": ObjectId(exchange_id)})
-        if not exchange:
-            raise HTTPException(status_code=404, detail="Exchange not found")
-        if exchange["status"] != ExchangeStatus.ACCEPTED:
-            raise HTTPException(status_code=400, detail="Exchange must be accepted before completion")
+        # Only accepted exchanges can be completed; enforced by the state machine
+        updated_exchange = await exchange_service.transition(exchange_id, ExchangeStatus.COMPLETED)
+        await cache_bus.publish("exchanges", exchange_id)
+        await stats_projector.record_completed_exchange(updated_exchange)
 
-        # Update exchange status
-        result = await db.exchanges.update_one(
-            {"_id": ObjectId(exchange_id)},
-            {"$set": {"status": ExchangeStatus.COMPLETED}}
-        )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Exchange not found")
-            
-        # Get updated exchange
-        updated_exchange = await db.exchanges.find_one({"_id": ObjectId(exchange_id)})
         updated_exchange["id"] = str(updated_exchange["_id"])
         del updated_exchange["_id"]
-        
         return updated_exchange
+    except ExchangeError as e:
+        raise exchange_error(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
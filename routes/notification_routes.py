@@ -4,6 +4,8 @@ from bson import ObjectId
 from datetime import datetime
 from models.notification_models import Notification, NotificationType, NotificationPreferences
 from dataBase import db
+from cache_bus import cache_bus
+from serialization import trusted_response
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
@@ -27,20 +29,23 @@ async def get_user_notifications(
         async for notif in cursor:
             notifications.append(notif)
             
-        return notifications
+        return trusted_response(Notification, notifications)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{notification_id}/read")
 async def mark_notification_read(notification_id: str):
     try:
-        result = await db.notifications.update_one(
+        notification = await db.notifications.find_one_and_update(
             {"_id": ObjectId(notification_id)},
-            {"$set": {"read": True}}
+            # read_at starts the retention TTL; $min keeps the first read time
+            {"$set": {"read": True}, "$min": {"read_at": datetime.utcnow()}},
+            projection={"user_id": 1}
         )
         
-        if result.matched_count == 0:
+        if notification is None:
             raise HTTPException(status_code=404, detail="Notification not found")
+        await cache_bus.publish("notifications", notification.get("user_id"))
             
         return {"message": "Notification marked as read"}
     except Exception as e:
@@ -63,6 +68,7 @@ async def send_notification(notification: Notification):
         notification_dict["created_at"] = datetime.utcnow()
         
         result = await db.notifications.insert_one(notification_dict)
+        await cache_bus.publish("notifications", notification.user_id)
         
         # TODO: Implement email/push notification sending based on user preferences
         
@@ -76,10 +82,14 @@ async def send_notification(notification: Notification):
 @router.delete("/{notification_id}")
 async def delete_notification(notification_id: str):
     try:
-        result = await db.notifications.delete_one({"_id": ObjectId(notification_id)})
+        notification = await db.notifications.find_one_and_delete(
+            {"_id": ObjectId(notification_id)},
+            projection={"user_id": 1}
+        )
         
-        if result.deleted_count == 0:
+        if notification is None:
             raise HTTPException(status_code=404, detail="Notification not found")
+        await cache_bus.publish("notifications", notification.get("user_id"))
             
         return {"message": "Notification deleted successfully"}
     except Exception as e:
@@ -96,6 +106,7 @@ async def update_notification_preferences(user_id: str, preferences: Notificatio
             {"$set": preferences_dict},
             upsert=True
         )
+        await cache_bus.publish("notification_preferences", user_id)
         
         return {"message": "Notification preferences updated successfully"}
     except Exception as e:
@@ -109,6 +120,7 @@ async def get_notification_preferences(user_id: str):
             # Return default preferences
             preferences = NotificationPreferences(user_id=user_id)
             await db.notification_preferences.insert_one(preferences.dict())
+            await cache_bus.publish("notification_preferences", user_id)
         return preferences
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
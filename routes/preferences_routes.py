@@ -4,6 +4,8 @@ from bson import ObjectId
 from datetime import datetime
 from models.preference_models import UserPreferences, AIRecommendation, BookTrending
 from dataBase import db
+from cache_bus import cache_bus
+from serialization import trusted_response
 
 router = APIRouter(tags=["preferences"])
 
@@ -18,6 +20,7 @@ async def set_user_preferences(user_id: str, preferences: UserPreferences):
             {"$set": preferences_dict},
             upsert=True
         )
+        await cache_bus.publish("preferences", user_id)
         
         updated_preferences = await db.preferences.find_one({"user_id": user_id})
         return updated_preferences
@@ -49,7 +52,7 @@ async def get_ai_recommendations(
         async for rec in cursor:
             recommendations.append(rec)
         
-        return recommendations
+        return trusted_response(AIRecommendation, recommendations)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -101,6 +104,7 @@ async def generate_ai_recommendations(user_id: str):
         if recommendations:
             await db.recommendations.delete_many({"user_id": user_id})
             await db.recommendations.insert_many(recommendations)
+            await cache_bus.publish("recommendations", user_id)
             
         return {"message": f"Generated {len(recommendations)} recommendations"}
     except Exception as e:
@@ -161,8 +165,8 @@ async def get_trending_books(
         
         async for book in cursor:
             book["book_id"] = str(book["_id"])
-            trending_books.append(BookTrending(**book))
+            trending_books.append(book)
             
-        return trending_books
+        return trusted_response(BookTrending, trending_books)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
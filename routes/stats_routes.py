@@ -4,6 +4,8 @@ from bson import ObjectId
 from datetime import datetime
 from models.stats_models import ReadingStats, BookInteraction, ReadingHabits, InteractionType
 from dataBase import db
+from cache_bus import cache_bus
+from stats_projector import stats_projector
 
 router = APIRouter(tags=["statistics"])
 
@@ -11,11 +13,8 @@ router = APIRouter(tags=["statistics"])
 async def get_reading_statistics(user_id: str):
     try:
         stats = await db.reading_stats.find_one({"user_id": user_id})
-        if not stats:
-            # Initialize stats if not exists
-            stats = ReadingStats(user_id=user_id)
-            await db.reading_stats.insert_one(stats.dict())
-        return stats
+        # Stats are written by the projector as events arrive; a user without any has defaults
+        return stats or ReadingStats(user_id=user_id, updated_at=datetime.utcnow())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -30,6 +29,7 @@ async def update_reading_stats(user_id: str, stats: ReadingStats):
             {"$set": stats_dict},
             upsert=True
         )
+        await cache_bus.publish("reading_stats", user_id)
         
         return {"message": "Reading stats updated successfully"}
     except Exception as e:
@@ -88,6 +88,7 @@ async def track_book_interaction(book_id: str, interaction: BookInteraction):
         interaction_dict["timestamp"] = datetime.utcnow()
         
         await db.book_interactions.insert_one(interaction_dict)
+        await cache_bus.publish("book_interactions", interaction.user_id)
         
         # Update book view count if interaction is a view
         if interaction.interaction_type == InteractionType.VIEW:
@@ -95,6 +96,9 @@ async def track_book_interaction(book_id: str, interaction: BookInteraction):
                 {"_id": ObjectId(book_id)},
                 {"$inc": {"view_count": 1}}
             )
+            # No "books" event: nothing cached depends on view_count, and views are the hottest write
+        # After every write of our own; projection never raises, so a retry cannot double-count
+        await stats_projector.record_interactions([(interaction.user_id, interaction.interaction_type, book)])
             
         return {"message": "Interaction tracked successfully"}
     except Exception as e:
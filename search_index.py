@@ -0,0 +1,159 @@
+import base64
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from cache_bus import cache_bus
+
+BM25_K1 = float(os.getenv("SEARCH_BM25_K1", 1.2))
+BM25_B = float(os.getenv("SEARCH_BM25_B", 0.75))
+
+# Term frequencies are scaled per field so a title hit outranks a description hit
+FIELD_WEIGHTS = {"bookName": 3, "authorName": 2, "genre": 2, "description": 1}
+INDEX_PROJECTION = {field: 1 for field in FIELD_WEIGHTS}
+INDEX_PROJECTION["is_taken"] = 1
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "to", "was", "with"
+}
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def encode_cursor(score: float, book_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, book_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        score, book_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(score), str(book_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class BookSearchIndex:
+    """In-process BM25 inverted index over the book catalog.
+
+    Each worker keeps its own copy; it is built at startup and kept current
+    through "books" events on the cache invalidation bus.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    async def start(self, db):
+        """Build the index and follow book changes; call from app startup"""
+        self._db = db
+        cache_bus.subscribe("books", self.refresh)
+        await self.rebuild()
+
+    async def rebuild(self):
+        index = BookSearchIndex()
+        async for book in self._db.books.find({}, INDEX_PROJECTION):
+            index.upsert(book)
+        self._postings, self._docs, self._total_length = index._postings, index._docs, index._total_length
+
+    async def refresh(self, book_ids: List[str]):
+        """Re-read changed books from Mongo; no ids means the whole catalog changed"""
+        if not book_ids:
+            await self.rebuild()
+            return
+        found = set()
+        object_ids = [ObjectId(book_id) for book_id in book_ids if ObjectId.is_valid(book_id)]
+        async for book in self._db.books.find({"_id": {"$in": object_ids}}, INDEX_PROJECTION):
+            self.upsert(book)
+            found.add(str(book["_id"]))
+        for book_id in book_ids:
+            if book_id not in found:
+                self.remove(book_id)
+
+    def upsert(self, book: Dict[str, Any]):
+        book_id = str(book["_id"])
+        self.remove(book_id)
+        tf: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(book.get(field)):
+                tf[token] += weight
+        length = sum(tf.values())
+        self._docs[book_id] = {"tf": tf, "length": length, "is_taken": bool(book.get("is_taken", False))}
+        self._total_length += length
+        for token, count in tf.items():
+            self._postings.setdefault(token, {})[book_id] = count
+
+    def remove(self, book_id: str):
+        doc = self._docs.pop(book_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc["length"]
+        for token in doc["tf"]:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(book_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def search(
+        self,
+        query: str,
+        available: Optional[bool] = None,
+        limit: int = 20,
+        after: Optional[Tuple[float, str]] = None
+    ) -> Tuple[List[Tuple[str, float]], int, Optional[Tuple[float, str]]]:
+        """Return ([(book_id, score)], total_matches, next_after) ordered by score, then id"""
+        terms = set(tokenize(query))
+        if not terms or not self._docs:
+            return [], 0, None
+
+        doc_count = len(self._docs)
+        avg_length = self._total_length / doc_count or 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for book_id, tf in postings.items():
+                length = self._docs[book_id]["length"]
+                norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                scores[book_id] = scores.get(book_id, 0.0) + idf * norm
+
+        if available is not None:
+            scores = {
+                book_id: score for book_id, score in scores.items()
+                if self._docs[book_id]["is_taken"] != available
+            }
+
+        # Rounded so cursor scores survive the JSON round trip and compare exactly
+        ranked = sorted(((-round(score, 6), book_id) for book_id, score in scores.items()))
+        total = len(ranked)
+        if after is not None:
+            position = (-after[0], after[1])
+            ranked = [entry for entry in ranked if entry > position]
+
+        page = ranked[:limit]
+        next_after = None
+        if len(ranked) > limit:
+            next_after = (-page[-1][0], page[-1][1])
+        return [(book_id, -neg_score) for neg_score, book_id in page], total, next_after
+
+
+# Global search index instance
+search_index = BookSearchIndex()
@@ -0,0 +1,119 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+PYDANTIC_V2 = hasattr(BaseModel, "model_fields")
+
+
+def _jsonable(value: Any) -> Any:
+    # Same representations FastAPI's jsonable_encoder produces for these types
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(_jsonable(k)): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, BaseModel):
+        return _jsonable(value.model_dump() if PYDANTIC_V2 else value.dict())
+    return str(value)
+
+
+def _nested_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    """The model inside an annotation such as Model, Optional[Model] or List[Model]"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def _is_float(annotation: Any) -> bool:
+    """float or Optional[float]"""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return args == [float]
+    return annotation is float
+
+
+def _field_table(model: Type[BaseModel]) -> List[Tuple[str, str, Callable[[], Any], Optional[Type[BaseModel]], bool]]:
+    """(name, alias, default factory, nested model, renders as float) for each field"""
+    if PYDANTIC_V2:
+        return [
+            (
+                name, field.alias or name,
+                # Required fields have no default; None matches what v1 gives Optional ones
+                (lambda: None) if field.is_required() else (lambda field=field: field.get_default(call_default_factory=True)),
+                _nested_model(field.annotation), _is_float(field.annotation)
+            )
+            for name, field in model.model_fields.items()
+        ]
+    return [
+        (
+            name, field.alias, field.get_default,
+            field.type_ if isinstance(field.type_, type) and issubclass(field.type_, BaseModel) else None,
+            field.outer_type_ is float
+        )
+        for name, field in model.__fields__.items()
+    ]
+
+
+class TrustedSerializer:
+    """Response serializer for documents the API wrote itself, skipping pydantic validation.
+
+    The model's fields and defaults are read once; each row is then reduced to
+    those fields, with defaults for missing ones and nested models handled the
+    same way, which is what response_model filtering would return for valid
+    rows. Client input must still go through the models.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._fields: List[Tuple[str, str, Callable[[], Any], Any, bool]] = []
+        # Mongo hands back whole numbers as int; the model would render float fields as floats
+        for name, alias, default, nested, as_float in _field_table(model):
+            self._fields.append((name, alias, default, TrustedSerializer(nested) if nested else None, as_float))
+
+    def dump(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        row = {}
+        for name, alias, default, nested, as_float in self._fields:
+            value = document[name] if name in document else default()
+            if as_float and isinstance(value, int) and not isinstance(value, bool):
+                value = float(value)
+            elif nested is not None and isinstance(value, dict):
+                value = nested.dump(value)
+            elif nested is not None and isinstance(value, list):
+                value = [nested.dump(v) if isinstance(v, dict) else _jsonable(v) for v in value]
+            else:
+                value = _jsonable(value)
+            row[alias] = value
+        return row
+
+    def dump_many(self, documents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.dump(document) for document in documents]
+
+    def response(self, documents: Iterable[Dict[str, Any]]) -> JSONResponse:
+        """A response FastAPI sends as-is, bypassing the route's response_model validation"""
+        return JSONResponse(self.dump_many(documents))
+
+
+_serializers: Dict[Type[BaseModel], TrustedSerializer] = {}
+
+
+def trusted_response(model: Type[BaseModel], documents: Iterable[Dict[str, Any]]) -> JSONResponse:
+    """Serialize rows we wrote ourselves as a list of `model`; keep response_model on the route for the docs"""
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers[model] = TrustedSerializer(model)
+    return serializer.response(documents)
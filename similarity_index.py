@@ -0,0 +1,265 @@
+import asyncio
+import math
+import os
+import tempfile
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from cache_bus import cache_bus
+from search_index import tokenize
+
+# TF-IDF vectors are randomly projected to this many dimensions, which keeps
+# cosine similarity approximately intact while the matrix stays small
+SIMILARITY_DIM = int(os.getenv("SIMILARITY_DIM", 256))
+SIMILARITY_BATCH_ROWS = int(os.getenv("SIMILARITY_BATCH_ROWS", 65536))
+# Where the memory-mapped vector files live; defaults to the system temp directory
+SIMILARITY_INDEX_DIR = os.getenv("SIMILARITY_INDEX_DIR") or None
+# Projection vectors are derived from the token's hash; this many are kept around
+SIMILARITY_TOKEN_CACHE_SIZE = int(os.getenv("SIMILARITY_TOKEN_CACHE_SIZE", 50000))
+REBUILD_ALL = "*"
+SIMILARITY_PROJECTION = {"bookName": 1, "authorName": 1, "genre": 1, "description": 1, "is_taken": 1}
+
+
+def book_features(book: Dict[str, Any]) -> Counter:
+    """Weighted term counts; author and genre are kept whole so they only match exactly"""
+    features: Counter = Counter()
+    for token in tokenize(book.get("bookName")):
+        features[token] += 2
+    for token in tokenize(book.get("description")):
+        features[token] += 1
+    author = " ".join(tokenize(book.get("authorName")))
+    if author:
+        features[f"author:{author}"] += 2
+    genre = " ".join(tokenize(book.get("genre")))
+    if genre:
+        features[f"genre:{genre}"] += 3
+    return features
+
+
+@lru_cache(maxsize=SIMILARITY_TOKEN_CACHE_SIZE)
+def _token_vector(feature: str, dim: int):
+    """Random projection of one feature; crc32 rather than hash() so every worker agrees"""
+    import numpy as np
+
+    rng = np.random.default_rng(zlib.crc32(feature.encode("utf-8")))
+    vector = (rng.standard_normal(dim) / math.sqrt(dim)).astype(np.float32)
+    vector.setflags(write=False)  # Shared between callers through the cache
+    return vector
+
+
+def preference_features(genres: List[str], authors: List[str]) -> Counter:
+    features: Counter = Counter()
+    for genre in genres:
+        features.update(book_features({"genre": str(genre)}))
+    for author in authors:
+        features.update(book_features({"authorName": str(author)}))
+    return features
+
+
+class SimilarityIndex:
+    """Content similarity between books over projected TF-IDF vectors.
+
+    Rows live in a memory-mapped float32 matrix that grows by doubling;
+    queries are brute-force cosine top-k done as batched matrix products.
+    Each worker keeps its own copy, built in a worker thread after startup
+    (and on full refreshes) and swapped in whole, then kept current through
+    "books" events on the cache invalidation bus.
+    Document frequencies are updated as books come and go, but existing rows
+    keep the weights they were built with until the next rebuild. NumPy is
+    only imported once the index is first built or queried.
+    """
+
+    def __init__(self, dim: int = SIMILARITY_DIM):
+        self.dim = dim
+        self._db = None
+        self._file = None
+        self._matrix = None
+        self._size = 0
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._alive = None
+        self._available = None
+        self._features: List[Optional[Counter]] = []
+        self._df: Counter = Counter()
+        self.ready = False
+        # Books changed while a rebuild was reading the catalog
+        self._changed_during_build: Optional[Set[str]] = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    async def start(self, db):
+        """Follow book changes and build the index in the background; call from app startup"""
+        self._db = db
+        cache_bus.subscribe("books", self.refresh)
+        asyncio.ensure_future(self._initial_build())
+
+    async def _initial_build(self):
+        try:
+            await self.rebuild()
+        except Exception as e:
+            print(f"Similarity index build error: {str(e)}")
+
+    def close(self):
+        self._matrix = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def rebuild(self):
+        self._changed_during_build = set()
+        try:
+            books = await self._db.books.find({}, SIMILARITY_PROJECTION).to_list(None)
+            # Vectorizing the catalog takes seconds for large catalogs; keep it off the event loop
+            index = await asyncio.get_event_loop().run_in_executor(None, self._build, books)
+        except Exception:
+            self._changed_during_build = None
+            raise
+        old_file = self._file
+        (self._file, self._matrix, self._size, self._rows, self._ids, self._alive,
+         self._available, self._features, self._df) = (
+            index._file, index._matrix, index._size, index._rows, index._ids, index._alive,
+            index._available, index._features, index._df
+        )
+        if old_file is not None:
+            old_file.close()
+        self.ready = True
+        changed, self._changed_during_build = self._changed_during_build, None
+        if changed:
+            await self.refresh([] if REBUILD_ALL in changed else list(changed))
+
+    def _build(self, books: List[Dict[str, Any]]) -> "SimilarityIndex":
+        """A new index over `books`; touches nothing shared, so it can run in a worker thread"""
+        index = SimilarityIndex(self.dim)
+        for book in books:
+            index._df.update(book_features(book).keys())
+        for book in books:
+            index.upsert(book, count_features=False)
+        return index
+
+    async def refresh(self, book_ids: List[str]):
+        """Re-read changed books from Mongo; no ids means the whole catalog changed"""
+        if self._changed_during_build is not None:
+            # The snapshot being built may predate these changes; apply them once it is swapped in
+            self._changed_during_build.update(book_ids or [REBUILD_ALL])
+            return
+        if not book_ids:
+            await self.rebuild()
+            return
+        found = set()
+        object_ids = [ObjectId(book_id) for book_id in book_ids if ObjectId.is_valid(book_id)]
+        async for book in self._db.books.find({"_id": {"$in": object_ids}}, SIMILARITY_PROJECTION):
+            self.upsert(book)
+            found.add(str(book["_id"]))
+        for book_id in book_ids:
+            if book_id not in found:
+                self.remove(book_id)
+
+    def vectorize(self, features: Counter):
+        import numpy as np
+
+        documents = max(len(self._rows), 1)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in features.items():
+            idf = math.log((documents + 1) / (self._df.get(feature, 0) + 1)) + 1
+            vector += (1 + math.log(count)) * idf * _token_vector(feature, self.dim)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _grow(self):
+        import numpy as np
+
+        capacity = max(1024, 2 * (self._matrix.shape[0] if self._matrix is not None else 0))
+        new_file = tempfile.NamedTemporaryFile(prefix="similarity-", suffix=".f32", dir=SIMILARITY_INDEX_DIR)
+        matrix = np.memmap(new_file, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        available = np.zeros(capacity, dtype=bool)
+        if self._matrix is not None:
+            matrix[:self._size] = self._matrix[:self._size]
+            alive[:self._size] = self._alive[:self._size]
+            available[:self._size] = self._available[:self._size]
+            self._file.close()
+        self._file, self._matrix, self._alive, self._available = new_file, matrix, alive, available
+
+    def upsert(self, book: Dict[str, Any], count_features: bool = True):
+        book_id = str(book["_id"])
+        features = book_features(book)
+        row = self._rows.get(book_id)
+        if count_features:
+            if row is not None:
+                self._df.subtract(self._features[row].keys())
+            self._df.update(features.keys())
+        if row is None:
+            if self._matrix is None or self._size == self._matrix.shape[0]:
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._ids.append(book_id)
+            self._features.append(None)
+            self._rows[book_id] = row
+        self._matrix[row] = self.vectorize(features)
+        self._features[row] = features
+        self._alive[row] = True
+        self._available[row] = not book.get("is_taken", False)
+
+    def remove(self, book_id: str):
+        row = self._rows.pop(book_id, None)
+        if row is None:
+            return
+        self._df.subtract(self._features[row].keys())
+        self._features[row] = None
+        self._ids[row] = None
+        self._alive[row] = False
+
+    def _top_k(self, query, k: int, available_only: bool, exclude_row: Optional[int] = None) -> List[Tuple[str, float]]:
+        import numpy as np
+
+        candidates: List[Tuple[float, int]] = []
+        for start in range(0, self._size, SIMILARITY_BATCH_ROWS):
+            stop = min(start + SIMILARITY_BATCH_ROWS, self._size)
+            scores = self._matrix[start:stop] @ query
+            mask = self._alive[start:stop] & (self._available[start:stop] if available_only else True)
+            if exclude_row is not None and start <= exclude_row < stop:
+                mask[exclude_row - start] = False
+            scores = np.where(mask, scores, -np.inf)
+            take = min(k, stop - start)
+            best = np.argpartition(-scores, take - 1)[:take]
+            candidates.extend((float(scores[i]), start + int(i)) for i in best if scores[i] > 0)
+        candidates.sort(reverse=True)
+        return [(self._ids[row], round(score, 6)) for score, row in candidates[:k]]
+
+    def similar(self, book_id: str, k: int = 10, available_only: bool = True) -> Optional[List[Tuple[str, float]]]:
+        """Most similar books to an indexed book, or None if the book is not indexed"""
+        row = self._rows.get(book_id)
+        if row is None:
+            return None
+        return self._top_k(self._matrix[row].copy(), k, available_only, exclude_row=row)
+
+    def preference_scores(self, genres: List[str], authors: List[str], books: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Cosine similarity between a user's favourite genres/authors and each indexed book.
+
+        Books that are not indexed yet get no score rather than being
+        vectorized one by one on the request path.
+        """
+        features = preference_features(genres, authors)
+        if not features or not self.ready:
+            return {}
+        book_ids, rows = [], []
+        for book in books:
+            book_id = str(book.get("id") or book.get("_id"))
+            row = self._rows.get(book_id)
+            if row is not None:
+                book_ids.append(book_id)
+                rows.append(row)
+        if not rows:
+            return {}
+        scores = self._matrix[rows] @ self.vectorize(features)
+        return {book_id: max(0.0, float(score)) for book_id, score in zip(book_ids, scores)}
+
+
+# Global similarity index instance
+similarity_index = SimilarityIndex()
@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+
+from metrics import current_route
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 100))
+SLOW_QUERY_LOG_BYTES = int(os.getenv("SLOW_QUERY_LOG_BYTES", 16 * 1024 * 1024))
+# A plan is explained at most once per query shape in this window
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = int(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", 300))
+SLOW_QUERY_COLLECTION = "slow_queries"
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Parts of a command that carry user data; everything else is kept verbatim in the shape
+REDACTED_FIELDS = {"filter", "query", "pipeline", "updates", "deletes", "update", "key"}
+# Driver-added fields that must not be passed back to explain
+SESSION_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction", "readConcern"}
+
+
+def redact(value: Any) -> Any:
+    """Replace literal values with "?" while keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(item, (dict, list, tuple)) for item in value):
+            return ["?"] if value else []
+        return [redact(item) for item in value]
+    return "?"
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    shape = {"command": command_name, "collection": command.get(command_name)}
+    for field, value in command.items():
+        if field == command_name or field in SESSION_FIELDS:
+            continue
+        if field in REDACTED_FIELDS:
+            shape[field] = redact(value)
+        elif field in ("sort", "projection", "hint"):
+            shape[field] = value
+    return shape
+
+
+def summarize_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Pull the stage names and examined counts out of an explain result"""
+    stages: List[str] = []
+    stats = {"keys_examined": 0, "docs_examined": 0, "n_returned": 0}
+
+    def walk(node: Any):
+        if isinstance(node, dict):
+            stage = node.get("stage")
+            if isinstance(stage, str) and stage not in stages:
+                stages.append(stage)
+            if "totalKeysExamined" in node:
+                stats["keys_examined"] += node.get("totalKeysExamined", 0)
+                stats["docs_examined"] += node.get("totalDocsExamined", 0)
+                stats["n_returned"] += node.get("nReturned", 0)
+            for key, child in node.items():
+                if key not in ("rejectedPlans", "allPlansExecution"):
+                    walk(child)
+        elif isinstance(node, list):
+            for child in node:
+                walk(child)
+
+    walk(explain)
+    return {"stages": stages, "collscan": "COLLSCAN" in stages, **stats}
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """pymongo command listener handing commands slower than the threshold to the slow query log"""
+
+    def __init__(self, log: "SlowQueryLog"):
+        self.log = log
+        self._pending: Dict[Tuple[int, object], Tuple[str, Dict[str, Any], str]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        if event.command.get(event.command_name) == SLOW_QUERY_COLLECTION:
+            return
+        command = {k: v for k, v in event.command.items() if k not in SESSION_FIELDS}
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (event.database_name, command, current_route.get())
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000.0
+        if duration_ms >= SLOW_QUERY_THRESHOLD_MS:
+            database, command, route = pending
+            self.log.submit(database, event.command_name, command, route, duration_ms)
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self.listener = SlowQueryListener(self)
+        self._db = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._plans: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    async def start(self, db):
+        """Create the capped collection and start recording; call from app startup"""
+        self._db = db
+        self._loop = asyncio.get_event_loop()
+        self._queue = asyncio.Queue(maxsize=1000)
+        try:
+            await db.create_collection(SLOW_QUERY_COLLECTION, capped=True, size=SLOW_QUERY_LOG_BYTES)
+        except CollectionInvalid:
+            pass
+        await db[SLOW_QUERY_COLLECTION].create_index([("shape_hash", 1), ("recorded_at", -1)])
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+        self._loop = None
+
+    def submit(self, database: str, command_name: str, command: Dict[str, Any], route: str, duration_ms: float):
+        """Called from driver threads; hands the record to the event loop"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        record = (database, command_name, command, route, duration_ms, datetime.utcnow())
+        try:
+            loop.call_soon_threadsafe(self._enqueue, record)
+        except RuntimeError:
+            pass
+
+    def _enqueue(self, record):
+        if self._queue is not None and not self._queue.full():
+            self._queue.put_nowait(record)
+
+    async def _run(self):
+        while True:
+            record = await self._queue.get()
+            try:
+                await self._store(*record)
+            except Exception as e:
+                print(f"Slow query log error: {str(e)}")
+
+    async def _store(self, database: str, command_name: str, command: Dict[str, Any], route: str, duration_ms: float, recorded_at: datetime):
+        shape = query_shape(command_name, command)
+        shape_hash = hashlib.sha1(json.dumps(shape, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        plan = await self._explain(shape_hash, database, command)
+        await self._db[SLOW_QUERY_COLLECTION].insert_one({
+            "shape_hash": shape_hash,
+            "shape": json.dumps(shape, sort_keys=True, default=str),
+            "collection": shape["collection"],
+            "operation": command_name,
+            "route": route or None,
+            "duration_ms": duration_ms,
+            "plan": plan,
+            "recorded_at": recorded_at
+        })
+
+    async def _explain(self, shape_hash: str, database: str, command: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        cached = self._plans.get(shape_hash)
+        if cached and time.monotonic() - cached[0] < SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+            return cached[1]
+        try:
+            explain = await self._db.client[database].command(
+                "explain", command, verbosity="executionStats"
+            )
+            plan = summarize_plan(explain)
+        except Exception as e:
+            plan = {"error": str(e)}
+        self._plans[shape_hash] = (time.monotonic(), plan)
+        return plan
+
+    async def top_offenders(self, limit: int = 20, since_minutes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Slow query shapes ordered by total time spent"""
+        pipeline: List[Dict[str, Any]] = []
+        if since_minutes:
+            pipeline.append({"$match": {"recorded_at": {"$gte": datetime.utcnow() - timedelta(minutes=since_minutes)}}})
+        pipeline += [
+            {"$sort": {"recorded_at": -1}},
+            {"$group": {
+                "_id": "$shape_hash",
+                "shape": {"$first": "$shape"},
+                "collection": {"$first": "$collection"},
+                "operation": {"$first": "$operation"},
+                "routes": {"$addToSet": "$route"},
+                "count": {"$sum": 1},
+                "total_ms": {"$sum": "$duration_ms"},
+                "avg_ms": {"$avg": "$duration_ms"},
+                "max_ms": {"$max": "$duration_ms"},
+                "plan": {"$first": "$plan"},
+                "last_seen": {"$first": "$recorded_at"}
+            }},
+            {"$sort": {"total_ms": -1}},
+            {"$limit": limit}
+        ]
+        offenders = []
+        async for row in self._db[SLOW_QUERY_COLLECTION].aggregate(pipeline):
+            row["shape_hash"] = row.pop("_id")
+            row["shape"] = json.loads(row["shape"])
+            offenders.append(row)
+        return offenders
+
+
+# Global slow query log instance
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,243 @@
+"""Reading stats projected from the interaction log and completed exchanges.
+
+Endpoints call the projector after their own writes, so GET /users/{id}/stats
+only ever reads. Projection is best effort: a failure is logged and never
+fails the write that triggered it. Existing history can be replayed into fresh projections with:
+
+    MONGO_URL=... python stats_projector.py --rebuild
+"""
+import argparse
+import asyncio
+import heapq
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from archival import EXCHANGES_ARCHIVE
+from cache_bus import cache_bus
+from collaborative import INTERACTION_WEIGHTS
+from suggest_index import normalize
+
+TOP_GENRES_SIZE = int(os.getenv("TOP_GENRES_SIZE", 5))
+# Genre weight of receiving a book, against the interaction weights
+EXCHANGE_COMPLETED_WEIGHT = float(os.getenv("EXCHANGE_COMPLETED_WEIGHT", 5))
+REBUILD_CHUNK_SIZE = int(os.getenv("STATS_REBUILD_CHUNK_SIZE", 5000))
+
+# Fields owned by the projector; a rebuild clears them before replaying history
+PROJECTED_FIELDS = [
+    "books_read", "authors_explored", "top_genres", "authors", "genre_counts", "genre_names",
+    "reading_habits.interactions"
+]
+GENRES_PROJECTION = {"_id": 0, "user_id": 1, "genre_counts": 1, "genre_names": 1, "top_genres": 1}
+# authors is unbounded, so its size is taken on the server rather than read back
+AUTHORS_EXPLORED_PIPELINE = [{"$set": {"authors_explored": {"$size": {"$ifNull": ["$authors", []]}}}}]
+
+
+def _field_key(value: str) -> str:
+    # Mongo field names cannot contain "." or start with "$"
+    return normalize(value).replace(".", "．").replace("$", "＄")
+
+
+class _Delta:
+    """Everything one batch adds to a single user's stats"""
+
+    def __init__(self):
+        self.inc: Dict[str, float] = defaultdict(int)
+        self.authors = set()
+        self.genres: Dict[str, str] = {}
+
+    def add_book(self, book: Dict[str, Any], weight: float):
+        author = normalize(book.get("authorName"))
+        if author:
+            self.authors.add(author)
+        genre = (book.get("genre") or "").strip()
+        if genre:
+            key = _field_key(genre)
+            self.genres.setdefault(key, genre)
+            self.inc[f"genre_counts.{key}"] += weight
+
+
+class StatsProjector:
+    """Keeps reading_stats current with atomic increments.
+
+    A batch is applied with one bulk_write of upserts, one per user touched,
+    applying $inc and $addToSet. The derived authors_explored and bounded
+    top_genres are refreshed afterwards by a background task that coalesces
+    users changed in the meantime, so they may lag the counts briefly.
+    """
+
+    def __init__(self):
+        self._db = None
+        # Users whose derived fields are waiting to be refreshed
+        self._derived: Set[str] = set()
+        self._derived_task: Optional[asyncio.Task] = None
+
+    def start(self, db):
+        self._db = db
+
+    async def ensure_indexes(self):
+        await self._db.reading_stats.create_index("user_id", unique=True)
+
+    async def stop(self):
+        """Finish refreshing derived fields that are already queued"""
+        if self._derived_task:
+            await self._derived_task
+
+    async def record_interactions(self, interactions: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]):
+        """Project (user_id, interaction_type, book) events; book may be None if unknown"""
+        try:
+            await self._apply(self._interaction_deltas(interactions))
+        except Exception as e:
+            print(f"Stats projection error: {str(e)}")
+
+    async def record_completed_exchange(self, exchange: Dict[str, Any]):
+        """The requester received the book, so it counts as read for them"""
+        try:
+            await self._apply(self._exchange_deltas(exchange))
+        except Exception as e:
+            print(f"Stats projection error: {str(e)}")
+
+    @staticmethod
+    def _interaction_deltas(interactions: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> Dict[str, _Delta]:
+        deltas: Dict[str, _Delta] = defaultdict(_Delta)
+        for user_id, interaction_type, book in interactions:
+            interaction_type = getattr(interaction_type, "value", interaction_type)
+            delta = deltas[user_id]
+            delta.inc[f"reading_habits.interactions.{interaction_type}"] += 1
+            if book:
+                delta.add_book(book, INTERACTION_WEIGHTS.get(interaction_type, 1.0))
+        return deltas
+
+    @staticmethod
+    def _exchange_deltas(exchange: Dict[str, Any]) -> Dict[str, _Delta]:
+        info = exchange.get("book_info") or {}
+        delta = _Delta()
+        delta.inc["books_read"] += 1
+        delta.add_book({"authorName": info.get("book_author"), "genre": info.get("book_genre")}, EXCHANGE_COMPLETED_WEIGHT)
+        return {exchange["requester_id"]: delta}
+
+    async def _apply(self, deltas: Dict[str, _Delta]):
+        if not deltas:
+            return
+        operations = [
+            UpdateOne({"user_id": user_id}, self._update(user_id, delta), upsert=True)
+            for user_id, delta in deltas.items()
+        ]
+        try:
+            await self._db.reading_stats.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            # Lost the race to create these users' documents; they exist now
+            await self._db.reading_stats.bulk_write([operations[error["index"]] for error in errors], ordered=False)
+        await cache_bus.publish("reading_stats", *deltas.keys())
+
+        changed = [user_id for user_id, delta in deltas.items() if delta.authors or delta.genres]
+        if changed:
+            self._derived.update(changed)
+            if self._derived_task is None or self._derived_task.done():
+                self._derived_task = asyncio.ensure_future(self._refresh_derived())
+
+    @staticmethod
+    def _update(user_id: str, delta: _Delta) -> Dict[str, Any]:
+        update: Dict[str, Any] = {
+            "$set": {"updated_at": datetime.utcnow()},
+            "$setOnInsert": {"user_id": user_id, "pages_read": 0}
+        }
+        if delta.inc:
+            update["$inc"] = dict(delta.inc)
+        if delta.authors:
+            update["$addToSet"] = {"authors": {"$each": sorted(delta.authors)}}
+        if delta.genres:
+            update["$set"].update({f"genre_names.{key}": genre for key, genre in delta.genres.items()})
+        return update
+
+    async def _refresh_derived(self):
+        while self._derived:
+            user_ids, self._derived = list(self._derived), set()
+            try:
+                await self.refresh_derived(user_ids)
+            except Exception as e:
+                print(f"Stats projection error: {str(e)}")
+
+    async def refresh_derived(self, user_ids: List[str]):
+        """Recompute authors_explored and top_genres for these users"""
+        await self._db.reading_stats.update_many({"user_id": {"$in": user_ids}}, AUTHORS_EXPLORED_PIPELINE)
+        updates = []
+        async for stats in self._db.reading_stats.find({"user_id": {"$in": user_ids}}, GENRES_PROJECTION):
+            counts = stats.get("genre_counts", {})
+            names = stats.get("genre_names", {})
+            top = [names.get(key, key) for key in heapq.nlargest(TOP_GENRES_SIZE, counts, key=counts.get)]
+            if top != stats.get("top_genres"):
+                updates.append(UpdateOne({"user_id": stats["user_id"]}, {"$set": {"top_genres": top}}))
+        if updates:
+            await self._db.reading_stats.bulk_write(updates, ordered=False)
+        await cache_bus.publish("reading_stats", *user_ids)
+
+    async def rebuild(self) -> Dict[str, int]:
+        """Replay all interactions and completed exchanges into fresh projections.
+
+        Events written while this runs may be counted twice; run it while the
+        API is quiet.
+        """
+        await self._db.reading_stats.update_many({}, {"$unset": {field: "" for field in PROJECTED_FIELDS}})
+        books: Dict[str, Optional[Dict[str, Any]]] = {}
+        replayed = {"interactions": 0, "exchanges": 0}
+
+        async def flush(events: List[Tuple[str, str, str]]):
+            missing = [book_id for _, _, book_id in events if book_id not in books]
+            object_ids = [ObjectId(book_id) for book_id in set(missing) if ObjectId.is_valid(book_id)]
+            async for book in self._db.books.find({"_id": {"$in": object_ids}}, {"authorName": 1, "genre": 1}):
+                books[str(book["_id"])] = book
+            for book_id in missing:
+                books.setdefault(book_id, None)
+            await self._apply(self._interaction_deltas((user_id, kind, books[book_id]) for user_id, kind, book_id in events))
+            replayed["interactions"] += len(events)
+            events.clear()
+
+        events: List[Tuple[str, str, str]] = []
+        cursor = self._db.book_interactions.find({}, {"_id": 0, "user_id": 1, "interaction_type": 1, "book_id": 1})
+        async for interaction in cursor.batch_size(10000):
+            if interaction.get("user_id") and interaction.get("interaction_type"):
+                events.append((interaction["user_id"], interaction["interaction_type"], str(interaction.get("book_id"))))
+            if len(events) >= REBUILD_CHUNK_SIZE:
+                await flush(events)
+        await flush(events)
+
+        for collection in ("exchanges", EXCHANGES_ARCHIVE):
+            async for exchange in self._db[collection].find({"status": "completed"}):
+                if not exchange.get("book_info"):
+                    # Exchanges created before book_info was stored on them
+                    book_id = exchange.get("book_id", "")
+                    book = await self._db.books.find_one({"_id": ObjectId(book_id)}) if ObjectId.is_valid(book_id) else None
+                    exchange["book_info"] = {"book_author": (book or {}).get("authorName"), "book_genre": (book or {}).get("genre")}
+                await self._apply(self._exchange_deltas(exchange))
+                replayed["exchanges"] += 1
+        await self.stop()
+        return replayed
+
+
+# Global stats projector instance
+stats_projector = StatsProjector()
+
+
+async def main(args):
+    import dataBase
+
+    stats_projector.start(dataBase.get_database())
+    await stats_projector.ensure_indexes()
+    if args.rebuild:
+        print(await stats_projector.rebuild())
+    dataBase.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="replay history into fresh projections")
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
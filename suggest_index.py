@@ -0,0 +1,210 @@
+import bisect
+import heapq
+import os
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from cache_bus import cache_bus
+
+# Suggestion kind -> book field it is built from
+SUGGEST_FIELDS = {"title": "bookName", "author": "authorName"}
+SUGGEST_PROJECTION = {**{field: 1 for field in SUGGEST_FIELDS.values()}, "is_taken": 1}
+# Prefixes up to this many characters keep a ranked top list; it must cover the endpoint's largest limit
+SUGGEST_SHORT_PREFIX = int(os.getenv("SUGGEST_SHORT_PREFIX", 2))
+SUGGEST_TOP_K = int(os.getenv("SUGGEST_TOP_K", 50))
+
+
+def normalize(text: Optional[str]) -> str:
+    """Casefold, strip diacritics and collapse whitespace so "Émile  Zola" matches "emile z" """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+class _PrefixIndex:
+    """Sorted (word suffix, value) keys searched with bisect; every word start of a value is a prefix entry point.
+
+    Prefixes of up to SUGGEST_SHORT_PREFIX characters match a large share of
+    the catalog, so their best SUGGEST_TOP_K values are kept ranked once
+    computed and adjusted as counts change instead of being rescanned.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []
+        # normalized value -> listing count per original spelling
+        self._values: Dict[str, Counter] = {}
+        # normalized value -> total listing count
+        self._counts: Dict[str, int] = {}
+        # short prefix -> its top values, best first
+        self._top: Dict[str, List[str]] = {}
+
+    def _rank(self, value: str) -> Tuple[int, str]:
+        return -self._counts[value], value
+
+    def add(self, display: str, keep_sorted: bool = True):
+        """Count a listing of `display`; pass keep_sorted=False while bulk loading and call sort() after"""
+        value = normalize(display)
+        if not value:
+            return
+        spellings = self._values.get(value)
+        if spellings is None:
+            spellings = self._values[value] = Counter()
+            words = value.split(" ")
+            for i in range(len(words)):
+                key = (" ".join(words[i:]), value)
+                if keep_sorted:
+                    bisect.insort(self._keys, key)
+                else:
+                    self._keys.append(key)
+        spellings[display.strip()] += 1
+        self._counts[value] = self._counts.get(value, 0) + 1
+        self._update_top(value, gained=True)
+
+    def sort(self):
+        self._keys.sort()
+        self._top.clear()
+
+    def discard(self, display: str):
+        value = normalize(display)
+        spellings = self._values.get(value)
+        if spellings is None:
+            return
+        spellings[display.strip()] -= 1
+        if spellings[display.strip()] <= 0:
+            del spellings[display.strip()]
+        self._counts[value] -= 1
+        if not spellings:
+            del self._values[value]
+            del self._counts[value]
+            words = value.split(" ")
+            for i in range(len(words)):
+                key = (" ".join(words[i:]), value)
+                position = bisect.bisect_left(self._keys, key)
+                if position < len(self._keys) and self._keys[position] == key:
+                    del self._keys[position]
+        self._update_top(value, gained=False)
+
+    def _short_prefixes(self, value: str) -> Set[str]:
+        prefixes = set()
+        for word_start in [0] + [i + 1 for i, ch in enumerate(value) if ch == " "]:
+            for length in range(1, SUGGEST_SHORT_PREFIX + 1):
+                prefixes.add(value[word_start:word_start + length])
+        return prefixes
+
+    def _update_top(self, value: str, gained: bool):
+        """Re-rank `value` in the cached top lists its count change can affect"""
+        if not self._top:
+            return
+        for prefix in self._short_prefixes(value):
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            if value in top:
+                if not gained and len(top) == SUGGEST_TOP_K:
+                    # A value outside the cached top may now outrank it
+                    del self._top[prefix]
+                    continue
+                top.remove(value)
+            elif not gained:
+                continue
+            # A list shorter than SUGGEST_TOP_K holds every match, so any match belongs in it
+            if value in self._counts and (len(top) < SUGGEST_TOP_K or self._rank(value) < self._rank(top[-1])):
+                ranks = [self._rank(v) for v in top]
+                top.insert(bisect.bisect_left(ranks, self._rank(value)), value)
+                del top[SUGGEST_TOP_K:]
+
+    def _matches(self, prefix: str):
+        start = bisect.bisect_left(self._keys, (prefix,))
+        end = bisect.bisect_left(self._keys, (prefix + "\uffff",))
+        return {value for _, value in self._keys[start:end]}
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= SUGGEST_SHORT_PREFIX and limit <= SUGGEST_TOP_K:
+            top = self._top.get(prefix)
+            if top is None:
+                top = self._top[prefix] = heapq.nsmallest(SUGGEST_TOP_K, self._matches(prefix), key=self._rank)
+            ranked = top[:limit]
+        else:
+            ranked = heapq.nsmallest(limit, self._matches(prefix), key=self._rank)
+        return [
+            {"value": self._values[value].most_common(1)[0][0], "count": self._counts[value]}
+            for value in ranked
+        ]
+
+
+class SuggestIndex:
+    """Typeahead over book titles and authors, ranked by how many available listings carry them.
+
+    Each worker keeps its own copy; it is built at startup and kept current
+    through "books" events on the cache invalidation bus.
+    """
+
+    def __init__(self):
+        self._db = None
+        self._indexes = {kind: _PrefixIndex() for kind in SUGGEST_FIELDS}
+        # book id -> indexed value per kind, so updates and deletes can undo the old values
+        self._books: Dict[str, Dict[str, str]] = {}
+
+    async def start(self, db):
+        """Build the index and follow book changes; call from app startup"""
+        self._db = db
+        cache_bus.subscribe("books", self.refresh)
+        await self.rebuild()
+
+    async def rebuild(self):
+        index = SuggestIndex()
+        async for book in self._db.books.find({"is_taken": {"$ne": True}}, SUGGEST_PROJECTION):
+            index.upsert(book, keep_sorted=False)
+        for prefix_index in index._indexes.values():
+            prefix_index.sort()
+        self._indexes, self._books = index._indexes, index._books
+
+    async def refresh(self, book_ids: List[str]):
+        """Re-read changed books from Mongo; no ids means the whole catalog changed"""
+        if not book_ids:
+            await self.rebuild()
+            return
+        found = set()
+        object_ids = [ObjectId(book_id) for book_id in book_ids if ObjectId.is_valid(book_id)]
+        async for book in self._db.books.find({"_id": {"$in": object_ids}}, SUGGEST_PROJECTION):
+            self.upsert(book)
+            found.add(str(book["_id"]))
+        for book_id in book_ids:
+            if book_id not in found:
+                self.remove(book_id)
+
+    def upsert(self, book: Dict[str, Any], keep_sorted: bool = True):
+        book_id = str(book["_id"])
+        if book.get("is_taken"):
+            # Taken books cannot be requested, so they are not suggested
+            self.remove(book_id)
+            return
+        values = {kind: (book.get(field) or "").strip() for kind, field in SUGGEST_FIELDS.items()}
+        if self._books.get(book_id) == values:
+            return
+        self.remove(book_id)
+        for kind, value in values.items():
+            self._indexes[kind].add(value, keep_sorted)
+        self._books[book_id] = values
+
+    def remove(self, book_id: str):
+        values = self._books.pop(book_id, None)
+        if values is None:
+            return
+        for kind, value in values.items():
+            self._indexes[kind].discard(value)
+
+    def suggest(self, prefix: str, kind: str = "title", limit: int = 10) -> List[Dict[str, Any]]:
+        return self._indexes[kind].suggest(prefix, limit)
+
+
+# Global suggestion index instance
+suggest_index = SuggestIndex()
@@ -0,0 +1,48 @@
+"""Fixtures for the API tests: the app runs against mongomock-motor and the fake AI backend.
+
+    pip install -r requirements.txt -r tests/requirements.txt
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Read at import time by the app modules, so set before anything imports main
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("AI_BACKEND", "fake")
+os.environ.setdefault("FAKE_AI_LATENCY_MS", "0")
+os.environ.setdefault("AI_WARMUP_ON_STARTUP", "0")
+# The test client only runs the event loop during requests, so publish without deferring
+os.environ.setdefault("CACHE_BUS_FLUSH_SECONDS", "0")
+
+
+@pytest.fixture
+def client():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from fastapi.testclient import TestClient
+
+    import dataBase
+    import main
+
+    dataBase.use_client(mongomock_motor.AsyncMongoMockClient())
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def book_id(client):
+    response = client.post("/books/", json={
+        "bookName": "Dune",
+        "authorName": "Frank Herbert",
+        "genre": "Science Fiction",
+        "bookCondition": "good",
+        "user_id": "owner"
+    })
+    assert response.status_code == 200
+    return response.json()["book_id"]
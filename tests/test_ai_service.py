@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import ai_service as ai_module
+from ai_backends import FakeGenerativeModel
+from ai_service import AIRecommendationService
+
+
+def test_first_request_loads_the_model_off_the_event_loop(monkeypatch):
+    loads = []
+
+    def slow_create_model():
+        loads.append(1)
+        time.sleep(0.3)  # Stands in for importing and configuring google.generativeai
+        return FakeGenerativeModel(latency_ms=0)
+
+    monkeypatch.setattr(ai_module, "create_model", slow_create_model)
+    service = AIRecommendationService()
+
+    async def scenario():
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticking = asyncio.ensure_future(ticker())
+        assert service.model is None  # Reading the model never loads it
+        answers = await asyncio.gather(*[service.generate_chat_response("hello") for _ in range(3)])
+        ticking.cancel()
+        return answers, max(gaps)
+
+    loop = asyncio.new_event_loop()
+    try:
+        answers, longest_gap = loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+
+    assert all(answers)
+    assert loads == [1]
+    assert longest_gap < 0.2
@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from archival import Archiver, TAKEN_RETENTION_DAYS, expired_books_filter
+
+BOOK = {"bookName": "Emma", "authorName": "Jane Austen", "genre": "Romance", "bookCondition": "good"}
+
+
+def test_update_book_stamps_and_clears_taken_at(client):
+    book_id = client.post("/books/", json={**BOOK, "user_id": "owner"}).json()["book_id"]
+
+    taken = client.put(f"/updateBook/{book_id}", json={**BOOK, "is_taken": True})
+    assert taken.status_code == 200
+    assert taken.json()["book"]["taken_at"]
+
+    released = client.put(f"/updateBook/{book_id}", json={**BOOK, "is_taken": False})
+    assert "taken_at" not in released.json()["book"]
+
+
+def test_sweep_archives_books_taken_before_taken_at_existed():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["archival_test"]
+    archiver = Archiver()
+    archiver._db = db
+
+    async def scenario():
+        await db.books.insert_one({**BOOK, "is_taken": True})
+        assert await archiver.stamp_taken_books() == 1
+        later = datetime.utcnow() + timedelta(days=TAKEN_RETENTION_DAYS + 1)
+        return await db.books.count_documents(expired_books_filter(later))
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(scenario()) == 1
+    finally:
+        loop.close()
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from cache_bus import CacheInvalidationBus
+
+
+class _RecordingCollection:
+    def __init__(self):
+        self.events = []
+
+    async def insert_many(self, events):
+        self.events.extend(events)
+
+
+def test_only_subscribed_collections_are_broadcast():
+    bus = CacheInvalidationBus()
+    events = _RecordingCollection()
+    bus._db = {"cache_invalidations": events}
+    seen = []
+    bus.subscribe("books", seen.append)
+
+    async def scenario():
+        await bus.publish("books", "b1")
+        await bus.publish("book_interactions", "u1")
+        await bus.publish("notifications", "u1")
+        await bus.flush()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+
+    assert seen == [["b1"]]
+    assert [event["collection"] for event in events.events] == ["books"]
+
+
+def test_subscribing_to_an_undeclared_collection_fails():
+    with pytest.raises(ValueError):
+        CacheInvalidationBus().subscribe("reading_stats", lambda keys: None)
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import exchange_service as exchange_module
+from exchange_service import BookUnavailable, ExchangeNotFound, ExchangeService, exchange_error
+from models.exchange_models import ExchangeStatus
+
+
+class _ConflictingSession:
+    """Replica-set session whose transaction keeps losing a WriteConflict"""
+
+    def __init__(self):
+        self.attempts = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def with_transaction(self, callback):
+        self.attempts += 1
+        error = OperationFailure("WriteConflict", code=112)
+        error._add_error_label("TransientTransactionError")
+        raise error
+
+
+class _Client:
+    def __init__(self, session):
+        self.session = session
+
+    async def start_session(self):
+        return self.session
+
+
+class _Database:
+    def __init__(self, session):
+        self.client = _Client(session)
+
+
+def test_concurrent_accept_conflict_is_a_409(monkeypatch):
+    session = _ConflictingSession()
+    monkeypatch.setattr(exchange_module, "db", _Database(session))
+    service = ExchangeService()
+    service._transactions = True
+
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(BookUnavailable) as raised:
+            loop.run_until_complete(service.transition(str(ObjectId()), ExchangeStatus.ACCEPTED))
+    finally:
+        loop.close()
+
+    assert session.attempts == 1
+    assert exchange_error(raised.value).status_code == 409
+
+
+def test_exchange_error_status_codes():
+    assert exchange_error(ExchangeNotFound("missing")).status_code == 404
+    assert exchange_error(BookUnavailable("taken")).status_code == 409
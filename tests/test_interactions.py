@@ -0,0 +1,31 @@
+from models.stats_models import MAX_INTERACTION_BATCH
+
+
+def test_main_imports():
+    import main
+
+    assert main.app is not None
+
+
+def test_batch_tracks_known_books_and_rejects_unknown(client, book_id):
+    response = client.post("/interactions/batch", json={"interactions": [
+        {"user_id": "reader", "book_id": book_id, "interaction_type": "view"},
+        {"user_id": "reader", "book_id": book_id, "interaction_type": "favorite"},
+        {"user_id": "reader", "book_id": "000000000000000000000000", "interaction_type": "view"},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["accepted"] == 2
+    assert [rejected["index"] for rejected in body["rejected"]] == [2]
+
+    stats = client.get("/users/reader/stats").json()
+    assert stats["reading_habits"]["interactions"] == {"view": 1, "favorite": 1}
+
+
+def test_batch_size_is_bounded(client, book_id):
+    interaction = {"user_id": "reader", "book_id": book_id, "interaction_type": "view"}
+
+    assert client.post("/interactions/batch", json={"interactions": []}).status_code == 422
+    too_many = {"interactions": [interaction] * (MAX_INTERACTION_BATCH + 1)}
+    assert client.post("/interactions/batch", json=too_many).status_code == 422
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from models.exchange_models import ExchangeDetails
+from models.notification_models import Notification
+from models.preference_models import AIRecommendation
+from serialization import trusted_response
+
+NOW = datetime(2024, 5, 1, 12, 30, 15, 123000)
+
+ROWS = {
+    "notifications": (Notification, [
+        {
+            "_id": ObjectId(), "user_id": "u1", "type": "book_available", "title": "New Book Available",
+            "message": "'Dune' was just listed", "data": {"book_id": "b1", "genre": "Fantasy"},
+            "read": True, "created_at": NOW
+        },
+        # Optional fields missing, as in rows written before they existed
+        {"user_id": "u1", "type": "exchange_request", "title": "Request", "message": "Swap?", "created_at": NOW},
+    ]),
+    "recommendations": (AIRecommendation, [
+        # Mongo hands back a whole match_percentage as int
+        {"_id": ObjectId(), "user_id": "u1", "book_id": "b1", "match_percentage": 90, "reason": "Genre", "created_at": NOW},
+        {"user_id": "u1", "book_id": "b2", "match_percentage": 41.5, "reason": "Author", "created_at": NOW},
+    ]),
+    "exchanges": (ExchangeDetails, [
+        {
+            "id": "e1", "requester_id": "u1", "book_id": "b1", "owner_id": "u2", "message": "Swap?",
+            "status": "accepted", "created_at": NOW, "updated_at": NOW + timedelta(hours=1),
+            "book_info": {"book_name": "Dune", "book_author": "Frank Herbert", "book_genre": "Science Fiction"},
+            "response": {"exchange_id": "e1", "response_type": "accepted", "message": "Sure", "created_at": NOW},
+        },
+        {
+            "id": "e2", "requester_id": "u1", "book_id": "b2", "owner_id": "u3", "message": None, "status": "pending",
+            "created_at": NOW, "updated_at": NOW,
+        },
+    ]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(ROWS))
+def test_trusted_output_matches_response_model(name):
+    model, rows = ROWS[name]
+    app = FastAPI()
+
+    @app.get("/validated", response_model=List[model])
+    async def validated():
+        return rows
+
+    @app.get("/trusted", response_model=List[model])
+    async def trusted():
+        return trusted_response(model, rows)
+
+    client = TestClient(app)
+    expected = client.get("/validated")
+    assert expected.status_code == 200
+    assert client.get("/trusted").json() == expected.json()